@@ -1,17 +1,26 @@
 # app/api.py
+import itertools
+import json
+import os
+from datetime import datetime
+from functools import lru_cache
 from typing import List, Optional
+from urllib.parse import urlencode
 
-from fastapi import FastAPI, Query, Depends, Request
+from fastapi import FastAPI, Query, Depends, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import JSONResponse, HTMLResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy import func, literal, text, select
+from sqlalchemy import func, literal, text, select, tuple_
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 
-from app.db import get_session, Base, engine   # use the shared session + engine
+from app.db import get_read_session, get_read_sessionmaker, pool_metrics   # GET routes read from the replica when configured
 from app.models import FactEvent, DimPlace, DimMagType
+from app.migrate import migrate, auto_migrate_enabled
+from app.singleflight import SingleFlight
+from app.profiling import PROFILE_SQL, SLOW_QUERY_MS, ServerTimingMiddleware, slow_queries
+from app.compression import COMPRESSION_ENABLED, CompressionMiddleware, PrecompressedCache, etag_for
 
 app = FastAPI(title="QuakeWatch API", version="0.1.0")
 
@@ -23,12 +32,96 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-templates = Jinja2Templates(directory="app/templates")
+# Per-request DB timings as Server-Timing headers when SQL profiling is on
+if PROFILE_SQL:
+    app.add_middleware(ServerTimingMiddleware)
 
-# Ensure tables exist on cold DBs (prevents first-hit errors)
+# gzip/br/zstd negotiation; added last so it wraps everything else
+compressed_cache = PrecompressedCache()
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, cache=compressed_cache)
+
+# Protects /admin/* when set (send it as X-Admin-Token)
+ADMIN_TOKEN = os.getenv("QW_ADMIN_TOKEN")
+
+# Identical concurrent GETs (same route + normalized params) share one DB query
+coalescer = SingleFlight(enabled=os.getenv("QW_COALESCE", "1") == "1")
+
+def _json_bytes(data) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode()
+
+def _json_response(key, query) -> Response:
+    """Run `query` through the coalescer and tag the body so its compressed forms can be cached."""
+    def tagged():
+        body = query()
+        return body, etag_for(body)
+
+    body, etag = coalescer.do(key, tagged)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+# Streamed HTML view: rows are fetched QW_HTML_BATCH_ROWS at a time and flushed
+# to the client in ~QW_HTML_FLUSH_BYTES chunks, so memory stays flat at any limit
+HTML_MAX_ROWS = int(os.getenv("QW_HTML_MAX_ROWS", "50000"))
+HTML_BATCH_ROWS = int(os.getenv("QW_HTML_BATCH_ROWS", "1000"))
+HTML_FLUSH_BYTES = int(os.getenv("QW_HTML_FLUSH_BYTES", "32768"))
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+
+# Jinja2 is only needed by the HTML view; load it on first use
+@lru_cache(maxsize=1)
+def get_templates():
+    from fastapi.templating import Jinja2Templates
+    return Jinja2Templates(directory=TEMPLATES_DIR)
+
+def _events_stmt(min_mag: float, max_mag: float):
+    """Flat event rows, newest first; (time_utc, event_id) is also the keyset for /events/chunk."""
+    return (
+        select(
+            FactEvent.event_id, FactEvent.time_utc, FactEvent.magnitude, DimMagType.mag_type,
+            FactEvent.latitude, FactEvent.longitude, FactEvent.depth_km, DimPlace.raw_place,
+        )
+        .select_from(FactEvent)
+        .join(DimPlace, FactEvent.place_id == DimPlace.place_id, isouter=True)
+        .join(DimMagType, FactEvent.mag_type_id == DimMagType.mag_type_id, isouter=True)
+        .where(FactEvent.magnitude >= min_mag, FactEvent.magnitude <= max_mag)
+        .order_by(FactEvent.time_utc.desc(), FactEvent.event_id.desc())
+    )
+
+def _event_row(row) -> dict:
+    return {
+        "event_id": row.event_id,
+        "time_utc": (row.time_utc.isoformat() if row.time_utc else None),
+        "magnitude": row.magnitude,
+        "mag_type": row.mag_type,
+        "lat": row.latitude,
+        "lon": row.longitude,
+        "depth_km": row.depth_km,
+        "place": row.raw_place,
+    }
+
+def _stream_rows(session_factory, stmt):
+    """Yield event dicts from a batched cursor; the session lives as long as the response body."""
+    with session_factory() as session:
+        result = session.execute(stmt.execution_options(yield_per=HTML_BATCH_ROWS))
+        for row in result:
+            yield _event_row(row)
+
+def _buffered(pieces, flush_bytes: int, first_bytes: int = 2048):
+    """Join Jinja's many small string pieces into chunks; the first one goes out early for a fast first paint."""
+    buf, size, limit = [], 0, first_bytes
+    for piece in pieces:
+        buf.append(piece)
+        size += len(piece)
+        if size >= limit:
+            yield "".join(buf).encode()
+            buf, size, limit = [], 0, flush_bytes
+    if buf:
+        yield "".join(buf).encode()
+
+# Schema is created by `python -m app.migrate`; QW_AUTO_MIGRATE=1 does it here for local dev
 @app.on_event("startup")
 def _startup():
-    Base.metadata.create_all(bind=engine)
+    if auto_migrate_enabled():
+        migrate()
 
 # Root sanity check
 @app.get("/")
@@ -59,44 +152,58 @@ def events_html(
     request: Request,
     min_mag: float = Query(0.0, ge=-1.0, le=12.0),
     max_mag: float = Query(10.0, ge=-1.0, le=12.0),
-    limit: int = Query(100, ge=1, le=2000),
-    session: Session = Depends(get_session),
+    limit: int = Query(100, ge=1, le=HTML_MAX_ROWS),
+    scroll: bool = Query(False, description="keep loading older events from /events/chunk while scrolling"),
+    session_factory=Depends(get_read_sessionmaker),
 ):
+    rows = _stream_rows(session_factory, _events_stmt(min_mag, max_mag).limit(limit))
     try:
-        q = (
-            session.query(FactEvent, DimPlace, DimMagType)
-            .join(DimPlace, FactEvent.place_id == DimPlace.place_id, isouter=True)
-            .join(DimMagType, FactEvent.mag_type_id == DimMagType.mag_type_id, isouter=True)
-            .filter(FactEvent.magnitude >= min_mag, FactEvent.magnitude <= max_mag)
-            .order_by(FactEvent.time_utc.desc())
-            .limit(limit)
-        )
-        rows = q.all()
-        data = [
-            {
-                "event_id": e.event_id,
-                "time_utc": (e.time_utc.isoformat() if e.time_utc else None),
-                "magnitude": e.magnitude,
-                "mag_type": (m.mag_type if m else None),
-                "lat": e.latitude,
-                "lon": e.longitude,
-                "depth_km": e.depth_km,
-                "place": (p.raw_place if p else None),
-            }
-            for e, p, m in rows
-        ]
-        return templates.TemplateResponse("events.html", {"request": request, "events": data})
+        # run the query before committing to a 200 so DB errors still come back as JSON
+        first = next(rows, None)
     except SQLAlchemyError as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
+    events = itertools.chain([first], rows) if first is not None else iter(())
+
+    template = get_templates().get_template("events.html")
+    pieces = template.generate(
+        request=request, events=events, scroll=scroll,
+        # relative, so the page fetches over whatever scheme/host the browser used (TLS-terminating proxies)
+        chunk_url=request.scope.get("root_path", "") + request.app.url_path_for("events_chunk")
+        + "?" + urlencode({"min_mag": min_mag, "max_mag": max_mag}),
+    )
+    return StreamingResponse(_buffered(pieces, HTML_FLUSH_BYTES), media_type="text/html; charset=utf-8")
+
+# Keyset-paged rows for the HTML view's scroll paging: pass back `next` to get the following page
+@app.get("/events/chunk")
+def events_chunk(
+    min_mag: float = Query(0.0, ge=-1.0, le=12.0),
+    max_mag: float = Query(10.0, ge=-1.0, le=12.0),
+    size: int = Query(500, ge=1, le=5000),
+    before_time: Optional[datetime] = Query(None, description="time_utc of the last row already shown"),
+    before_id: Optional[str] = Query(None, description="event_id of the last row already shown"),
+    session: Session = Depends(get_read_session),
+):
+    stmt = _events_stmt(min_mag, max_mag).limit(size)
+    if before_time is not None and before_id is not None:
+        stmt = stmt.where(tuple_(FactEvent.time_utc, FactEvent.event_id) < tuple_(before_time, before_id))
+    try:
+        events = [_event_row(r) for r in session.execute(stmt)]
+    except SQLAlchemyError as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    last = events[-1] if len(events) == size else None
+    return {
+        "events": events,
+        "next": {"before_time": last["time_utc"], "before_id": last["event_id"]} if last else None,
+    }
 
 @app.get("/events.json", response_model=List[EventOut])
 def events_json(
     min_mag: float = Query(0.0, ge=-1.0, le=12.0),
     max_mag: float = Query(10.0, ge=-1.0, le=12.0),
     limit: int = Query(100, ge=1, le=2000),
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
 ):
-    try:
+    def query() -> bytes:
         q = (
             session.query(FactEvent, DimPlace, DimMagType)
             .join(DimPlace, FactEvent.place_id == DimPlace.place_id, isouter=True)
@@ -106,7 +213,7 @@ def events_json(
             .limit(limit)
         )
         rows = q.all()
-        return [
+        return _json_bytes([
             {
                 "event_id": e.event_id,
                 "time_utc": (e.time_utc.isoformat() if e.time_utc else None),
@@ -118,16 +225,19 @@ def events_json(
                 "place": (p.raw_place if p else None),
             }
             for e, p, m in rows
-        ]
+        ])
+
+    try:
+        return _json_response(("events.json", min_mag, max_mag, limit), query)
     except SQLAlchemyError as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.get("/stats/by-country", response_model=List[CountryStat])
 def stats_by_country(
     min_mag: float = Query(4.0, ge=-1.0, le=12.0),
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
 ):
-    try:
+    def query() -> bytes:
         unknown = literal("Unknown")
         country_expr = func.coalesce(DimPlace.country, unknown).label("country")
         count_expr = func.count(FactEvent.event_id).label("events")
@@ -141,14 +251,37 @@ def stats_by_country(
             .order_by(count_expr.desc())
         )
         rows = session.execute(stmt).all()
-        return [{"country": c, "events": int(n)} for (c, n) in rows]
+        return _json_bytes([{"country": c, "events": int(n)} for (c, n) in rows])
+
+    try:
+        return _json_response(("stats/by-country", min_mag), query)
     except SQLAlchemyError as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.get("/health", response_model=HealthOut)
-def health(session: Session = Depends(get_session)):
+def health(session: Session = Depends(get_read_session)):
     try:
         session.execute(text("SELECT 1"))
         return {"ok": True}
     except SQLAlchemyError as e:
         return JSONResponse(status_code=500, content={"ok": False, "error": str(e)})
+
+# Operational counters (DB pool checkouts and wait times, request coalescing, compressed-body cache)
+@app.get("/metrics")
+def metrics():
+    return {"db": pool_metrics(), "coalescing": coalescer.stats(), "compression": compressed_cache.stats()}
+
+# Slowest query shapes seen since startup (requires QW_PROFILE_SQL=1)
+@app.get("/admin/slow-queries")
+def admin_slow_queries(
+    limit: int = Query(10, ge=1, le=100),
+    order_by: str = Query("max_ms", pattern="^(max_ms|avg_ms|total_ms|count)$"),
+    x_admin_token: Optional[str] = Header(None),
+):
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        return JSONResponse(status_code=403, content={"error": "admin token required"})
+    return {
+        "enabled": PROFILE_SQL,
+        "threshold_ms": SLOW_QUERY_MS,
+        "queries": slow_queries.top(limit, order_by),
+    }
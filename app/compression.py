@@ -0,0 +1,226 @@
+# app/compression.py
+import gzip
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional: br is simply not offered
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd is simply not offered
+    zstandard = None
+
+# Response compression negotiated from Accept-Encoding. Bodies smaller than
+# QW_COMPRESS_MIN_BYTES go out as-is. Responses that carry an ETag are
+# cacheable: their compressed variants are kept in a byte-bounded LRU keyed by
+# (ETag, encoding), so a body served many times is compressed once per encoding.
+COMPRESSION_ENABLED = os.getenv("QW_COMPRESSION", "1") == "1"
+COMPRESS_MIN_BYTES = int(os.getenv("QW_COMPRESS_MIN_BYTES", "1024"))
+# server preference when the client accepts several encodings with equal q
+COMPRESS_ENCODINGS = [e.strip() for e in os.getenv("QW_COMPRESS_ENCODINGS", "zstd,br,gzip").split(",") if e.strip()]
+GZIP_LEVEL = int(os.getenv("QW_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("QW_BROTLI_QUALITY", "5"))
+ZSTD_LEVEL = int(os.getenv("QW_ZSTD_LEVEL", "3"))
+COMPRESS_CACHE_BYTES = int(os.getenv("QW_COMPRESS_CACHE_MB", "64")) * 1024 * 1024
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+def available_encodings() -> list:
+    have = {"gzip": True, "br": brotli is not None, "zstd": zstandard is not None}
+    return [e for e in COMPRESS_ENCODINGS if have.get(e)]
+
+def negotiate(accept_encoding: str, supported: list = None):
+    """Pick the encoding to use for an Accept-Encoding header, or None for identity."""
+    supported = available_encodings() if supported is None else supported
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+class StreamCompressor:
+    """Incremental compressor that flushes after each chunk, so streamed pages render progressively."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+        elif encoding == "zstd":
+            self._c = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "gzip":
+            return self._c.compress(data) + self._c.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._c.process(data) + self._c.flush()
+        return self._c.compress(data) + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._c.finish()
+        return self._c.flush()
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+class PrecompressedCache:
+    """LRU of compressed bodies keyed by (ETag, encoding), bounded by total bytes."""
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = COMPRESS_CACHE_BYTES if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            body = self._items.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self.size, "hits": self.hits, "misses": self.misses}
+
+class CompressionMiddleware:
+    """ASGI middleware: negotiated gzip/br/zstd for text-like responses, streaming included."""
+
+    def __init__(self, app, minimum_size: int = None, cache: PrecompressedCache = None):
+        self.app = app
+        self.minimum_size = COMPRESS_MIN_BYTES if minimum_size is None else minimum_size
+        self.cache = cache if cache is not None else PrecompressedCache()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None     # set once we know the response is streamed
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if (headers.get("content-encoding") or message["status"] in (204, 304)
+                        or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message   # held until we've seen the first body chunk
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None and start is not None:
+                headers = MutableHeaders(scope=start)
+                headers.add_vary_header("Accept-Encoding")
+                if not more_body:
+                    # whole body in one message
+                    if len(body) >= self.minimum_size:
+                        body = self._compress_whole(body, encoding, headers)
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    start = None
+                    return
+                compressor = StreamCompressor(encoding)
+                headers["Content-Encoding"] = encoding
+                del headers["Content-Length"]
+                if "etag" in headers:
+                    headers["ETag"] = _encoded_etag(headers["etag"], encoding)
+                await send(start)
+                start = None
+
+            data = compressor.chunk(body) if body else b""
+            if not more_body:
+                data += compressor.finish()
+            if data or not more_body:
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compress_whole(self, body: bytes, encoding: str, headers: MutableHeaders) -> bytes:
+        etag = headers.get("etag")
+        compressed = self.cache.get((etag, encoding)) if etag else None
+        if compressed is None:
+            compressed = compress(body, encoding)
+            if etag:
+                self.cache.put((etag, encoding), compressed)
+        headers["Content-Encoding"] = encoding
+        headers["Content-Length"] = str(len(compressed))
+        if etag:
+            headers["ETag"] = _encoded_etag(etag, encoding)
+        return compressed
+
+def _encoded_etag(etag: str, encoding: str) -> str:
+    # each representation needs its own validator
+    return f'{etag[:-1]}-{encoding}"' if etag.endswith('"') else f"{etag}-{encoding}"
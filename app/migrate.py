@@ -0,0 +1,54 @@
+# app/migrate.py
+"""
+One-time schema migration.
+
+Run once per deploy (`python -m app.migrate`, `make migrate`, or the `migrate`
+compose service) instead of calling `create_all` on every API start or ETL run.
+Bump SCHEMA_VERSION whenever models.py gains tables or indexes.
+"""
+import logging
+import os
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.db import engine, Base
+from app.models import SchemaVersion
+
+SCHEMA_VERSION = 3   # v2: alert_subscription, alert_delivery; v3: ix_event_time_id
+
+def current_version(bind=None) -> int:
+    """Schema version recorded in the DB (0 for a cold database)."""
+    bind = bind or engine
+    try:
+        with Session(bind) as session:
+            return session.execute(select(SchemaVersion.version)).scalar() or 0
+    except SQLAlchemyError:
+        return 0
+
+def migrate(bind=None) -> int:
+    """Create missing tables/indexes if the DB is behind SCHEMA_VERSION."""
+    bind = bind or engine
+    found = current_version(bind)
+    if found >= SCHEMA_VERSION:
+        return found
+    logging.info(f"Migrating schema v{found} -> v{SCHEMA_VERSION}")
+    Base.metadata.create_all(bind)
+    # create_all skips tables that already exist, so add their new indexes explicitly
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
+    with Session(bind) as session:
+        session.query(SchemaVersion).delete()
+        session.add(SchemaVersion(version=SCHEMA_VERSION))
+        session.commit()
+    return SCHEMA_VERSION
+
+def auto_migrate_enabled() -> bool:
+    """Local/dev escape hatch: QW_AUTO_MIGRATE=1 migrates on process start."""
+    return os.getenv("QW_AUTO_MIGRATE", "0") == "1"
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Schema at v{migrate()}")
@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, String, Float, DateTime, ForeignKey, Index
+    Column, Integer, String, Float, DateTime, ForeignKey, Index, Text, UniqueConstraint
 )
 from sqlalchemy.orm import relationship
 from .db import Base
@@ -49,3 +49,42 @@ class FactEvent(Base):
 
 # Composite index for performance on time + magnitude queries
 Index("ix_event_time_mag", FactEvent.time_utc, FactEvent.magnitude)
+# Keyset paging for /events/chunk: ORDER BY time_utc DESC, event_id DESC
+Index("ix_event_time_id", FactEvent.time_utc, FactEvent.event_id)
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True, nullable=False)
+
+    def __repr__(self):
+        return f"<SchemaVersion(version={self.version})>"
+
+class AlertSubscription(Base):
+    __tablename__ = "alert_subscription"
+
+    subscription_id = Column(Integer, primary_key=True, nullable=False)
+    name          = Column(String(100), nullable=True)
+    min_magnitude = Column(Float, nullable=False, default=0.0)
+
+    # radius zone: center + radius_km; polygon zone: JSON list of [lon, lat] vertices
+    center_lat = Column(Float, nullable=True)
+    center_lon = Column(Float, nullable=True)
+    radius_km  = Column(Float, nullable=True)
+    polygon    = Column(Text, nullable=True)
+
+    channel = Column(String(50), nullable=False, default="log")   # notifier name, see etl/notify.py
+    target  = Column(String(500), nullable=True)                   # e.g. webhook URL
+    active  = Column(Integer, nullable=False, default=1)
+
+    def __repr__(self):
+        return f"<AlertSubscription(id={self.subscription_id}, min_magnitude={self.min_magnitude})>"
+
+class AlertDelivery(Base):
+    __tablename__ = "alert_delivery"
+    __table_args__ = (UniqueConstraint("subscription_id", "event_id", name="uq_alert_delivery"),)
+
+    delivery_id     = Column(Integer, primary_key=True, nullable=False)
+    subscription_id = Column(Integer, ForeignKey("alert_subscription.subscription_id"), nullable=False)
+    event_id        = Column(String, nullable=False, index=True)
+    sent_at         = Column(DateTime(timezone=True), nullable=False)
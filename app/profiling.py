@@ -0,0 +1,155 @@
+# app/profiling.py
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+
+# Opt-in SQL profiling: per-request statement timings (Server-Timing header),
+# a slow-query log with the plan of each slow statement, and an aggregate of
+# the slowest query shapes for /admin/slow-queries.
+PROFILE_SQL = os.getenv("QW_PROFILE_SQL", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("QW_SLOW_QUERY_MS", "200"))
+# EXPLAIN ANALYZE runs the statement a second time; QW_EXPLAIN_SLOW=0 logs timings only
+EXPLAIN_SLOW = os.getenv("QW_EXPLAIN_SLOW", "1") == "1"
+
+log = logging.getLogger("quakewatch.sql")
+
+# list of (shape, ms) for the request being served, None outside a request
+_request_timings: ContextVar = ContextVar("qw_request_timings", default=None)
+
+_IN_LIST = re.compile(r"\((?:\s*(?:\?|%\([^)]+\)s|:\w+)\s*,)+\s*(?:\?|%\([^)]+\)s|:\w+)\s*\)")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+def query_shape(statement: str) -> str:
+    """Statement text with whitespace, literals and IN-lists collapsed."""
+    shape = _IN_LIST.sub("(?...)", statement)
+    shape = _NUMBER.sub("?", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+class SlowQueryLog:
+    """Aggregated timings per query shape, with the last captured plan."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shapes = {}
+
+    def record(self, shape: str, ms: float, plan: str = None):
+        with self._lock:
+            entry = self._shapes.setdefault(shape, {"shape": shape, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "plan": None})
+            entry["count"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            if plan is not None:
+                entry["plan"] = plan
+
+    def top(self, n: int = 10, order_by: str = "max_ms") -> list:
+        with self._lock:
+            entries = [dict(e, avg_ms=e["total_ms"] / e["count"]) for e in self._shapes.values()]
+        entries.sort(key=lambda e: e[order_by], reverse=True)
+        return [
+            {**e, "total_ms": round(e["total_ms"], 3), "max_ms": round(e["max_ms"], 3), "avg_ms": round(e["avg_ms"], 3)}
+            for e in entries[:n]
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._shapes.clear()
+
+slow_queries = SlowQueryLog()
+
+def _explain(conn, statement: str, parameters) -> str:
+    """Plan of a slow SELECT on the same connection (EXPLAIN ANALYZE on PostgreSQL)."""
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        prefix = "EXPLAIN (ANALYZE, BUFFERS) "
+    elif dialect == "sqlite":
+        prefix = "EXPLAIN QUERY PLAN "
+    else:
+        prefix = "EXPLAIN "
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        if dialect == "postgresql":
+            # a failing EXPLAIN must not abort the request's transaction
+            cursor.execute("SAVEPOINT qw_explain")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        except Exception as e:
+            if dialect == "postgresql":
+                cursor.execute("ROLLBACK TO SAVEPOINT qw_explain")
+            return f"EXPLAIN failed: {e}"
+        if dialect == "postgresql":
+            cursor.execute("RELEASE SAVEPOINT qw_explain")
+        return "\n".join(" | ".join(str(col) for col in row) for row in rows)
+    finally:
+        cursor.close()
+
+def instrument(engine, threshold_ms: float = None, explain: bool = None):
+    """Attach statement timing, slow-query logging and plan capture to an engine."""
+    threshold_ms = SLOW_QUERY_MS if threshold_ms is None else threshold_ms
+    explain = EXPLAIN_SLOW if explain is None else explain
+
+    # the start time lives on the per-statement execution context, so a statement
+    # that raises (no after_cursor_execute) leaves nothing behind on the connection
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        context._qw_query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        ms = (time.perf_counter() - context._qw_query_start) * 1e3
+        shape = query_shape(statement)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((shape, ms))
+        if ms < threshold_ms:
+            return
+        plan = None
+        if explain and not executemany and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            plan = _explain(conn, statement, parameters)
+        slow_queries.record(shape, ms, plan)
+        log.warning("slow query %.1f ms: %s%s", ms, shape, f"\n{plan}" if plan else "")
+
+    return engine
+
+@contextmanager
+def collect():
+    """Collect (shape, ms) for every statement executed in this context."""
+    timings = []
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+class ServerTimingMiddleware:
+    """ASGI middleware adding `Server-Timing: db;dur=..;desc="N queries", app;dur=..`."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with collect() as timings:
+            async def send_with_timing(message):
+                if message["type"] == "http.response.start":
+                    db_ms = sum(ms for _, ms in timings)
+                    app_ms = (time.perf_counter() - started) * 1e3
+                    MutableHeaders(scope=message).append(
+                        "Server-Timing",
+                        f'db;dur={db_ms:.1f};desc="{len(timings)} queries", app;dur={app_ms:.1f}',
+                    )
+                await send(message)
+
+            await self.app(scope, receive, send_with_timing)
@@ -0,0 +1,75 @@
+# app/singleflight.py
+import threading
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one execution.
+
+    The first caller for a key runs `fn`; callers arriving while it is in
+    flight block and receive the same result (or exception). Nothing is
+    cached once the call finishes. Sync FastAPI routes run in a threadpool,
+    so a thread Event is enough to park the followers.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.calls = 0
+        self.executions = 0
+
+    def do(self, key, fn):
+        if not self.enabled:
+            with self._lock:
+                self.calls += 1
+                self.executions += 1
+            return fn()
+
+        with self._lock:
+            self.calls += 1
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.executions += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.executions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls, executions = self.calls, self.executions
+        return {
+            "enabled": self.enabled,
+            "calls": calls,
+            "executions": executions,
+            "coalesced": calls - executions,
+            "coalescing_ratio": round((calls - executions) / calls, 4) if calls else 0.0,
+        }
@@ -0,0 +1,54 @@
+# benchmarks/bench_alerts.py
+"""
+Geofence matching throughput: build the grid index over many radius
+subscriptions and match a batch of events, with a brute-force spot check.
+
+    python -m benchmarks.bench_alerts --subscriptions 100000 --events 10000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from etl.alerts import GridIndex, Zone
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--subscriptions", type=int, default=100_000)
+    parser.add_argument("--events", type=int, default=10_000)
+    parser.add_argument("--cell-deg", type=float, default=1.0)
+    parser.add_argument("--check", type=int, default=200, help="subscriptions to verify by brute force")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    zones = [
+        Zone(i, min_magnitude=m, lat=lat, lon=lon, radius_km=r)
+        for i, (lat, lon, r, m) in enumerate(zip(
+            rng.uniform(-70, 70, args.subscriptions), rng.uniform(-180, 180, args.subscriptions),
+            rng.uniform(5, 300, args.subscriptions), rng.uniform(0, 5, args.subscriptions),
+        ))
+    ]
+    lat, lon = rng.uniform(-70, 70, args.events), rng.uniform(-180, 180, args.events)
+    mag = rng.uniform(0, 7, args.events)
+
+    started = time.perf_counter()
+    index = GridIndex(zones, cell_deg=args.cell_deg)
+    build_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    hits = index.match(lat, lon, mag)
+    match_s = time.perf_counter() - started
+    pairs = sum(len(pos) for _, pos in hits)
+
+    found = {z.subscription_id: set(pos.tolist()) for z, pos in hits}
+    for z in rng.choice(zones, size=min(args.check, len(zones)), replace=False):
+        expected = set(np.flatnonzero(z.contains(lat, lon) & (mag >= z.min_magnitude)).tolist())
+        assert found.get(z.subscription_id, set()) == expected, f"mismatch for subscription {z.subscription_id}"
+
+    print(f"index build: {build_s:.2f}s for {args.subscriptions} subscriptions ({args.cell_deg}° cells)")
+    print(f"match:       {match_s:.3f}s for {args.events} events -> {pairs} (subscription, event) pairs")
+    print(f"             {args.events / match_s:,.0f} events/s; brute-force check on {args.check} subscriptions ok")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_coalescing.py
+"""
+Burst of identical API requests with and without request coalescing,
+counting the SQL statements that actually reach the database.
+
+    python -m benchmarks.bench_coalescing --burst 200 --events 50000
+
+Uses its own SQLite file unless DATABASE_URL is set.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_coalescing.db")
+
+import httpx
+from sqlalchemy import event
+
+from app.api import app, coalescer
+from app.db import read_engine
+from app.migrate import migrate
+from benchmarks.bench_transform import synthetic_features
+from etl.load import load_events
+from etl.transform import features_to_df
+
+ROUTES = ["/events.json?min_mag=4&limit=2000", "/stats/by-country?min_mag=1"]
+
+async def burst(n: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(client.get(ROUTES[i % len(ROUTES)]) for i in range(n)))
+        elapsed = time.perf_counter() - started
+    assert all(r.status_code == 200 for r in responses)
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=200)
+    parser.add_argument("--events", type=int, default=50_000)
+    args = parser.parse_args()
+
+    migrate()
+    load_events(features_to_df(synthetic_features(args.events)))
+
+    statements = []
+    event.listen(read_engine, "before_cursor_execute", lambda *a: statements.append(1))
+
+    for enabled in (False, True):
+        coalescer.enabled = enabled
+        coalescer.reset()
+        statements.clear()
+        elapsed = asyncio.run(burst(args.burst))
+        ratio = coalescer.stats()["coalescing_ratio"]
+        print(f"coalescing={'on ' if enabled else 'off'}  {args.burst} requests  {len(statements):4d} SQL statements  "
+              f"{elapsed:6.2f}s  ratio={ratio}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# benchmarks/bench_compression.py
+"""
+Bytes on the wire and server CPU per request for each content encoding,
+with the precompressed-body cache cold (every request compresses) and warm.
+
+    python -m benchmarks.bench_compression --events 50000 --requests 50
+
+Requests are sent straight to the ASGI app and the compressed bytes are
+counted as sent, so client-side decoding is not part of the CPU figures.
+Uses its own SQLite file unless DATABASE_URL is set.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_compression.db")
+
+from app.api import app, compressed_cache
+from app.compression import available_encodings, compress
+from app.migrate import migrate
+from benchmarks.bench_transform import synthetic_features
+from etl.load import load_events
+from etl.transform import features_to_df
+
+ROUTES = ["/events.json?limit=2000", "/stats/by-country?min_mag=1", "/events?limit=2000"]
+
+async def asgi_get(path: str, encoding: str) -> bytes:
+    """GET through the full middleware stack; returns the body as sent."""
+    route, _, query = path.partition("?")
+    headers = [(b"accept-encoding", encoding.encode())] if encoding != "identity" else []
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": route, "raw_path": route.encode(), "query_string": query.encode(),
+        "root_path": "", "headers": headers, "client": ("bench", 1), "server": ("bench", 80),
+    }
+    chunks = []
+    status = None
+
+    requested = False
+
+    async def receive():
+        nonlocal requested
+        if requested:
+            await asyncio.sleep(3600)   # streamed responses wait for a disconnect that never comes
+        requested = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    assert status == 200, f"{path} returned {status}"
+    return b"".join(chunks)
+
+async def run(path: str, encoding: str, n: int, warm: bool):
+    cpu = time.process_time()
+    for _ in range(n):
+        if not warm:
+            compressed_cache.clear()
+        body = await asgi_get(path, encoding)
+    return body, (time.process_time() - cpu) / n * 1e3
+
+def compress_cpu_ms(body: bytes, encoding: str, n: int) -> float:
+    """CPU for compressing the body alone, i.e. what the warm cache saves per request."""
+    cpu = time.process_time()
+    for _ in range(n):
+        compress(body, encoding)
+    return (time.process_time() - cpu) / n * 1e3
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    migrate()
+    load_events(features_to_df(synthetic_features(args.events)))
+
+    for path in ROUTES:
+        print(path)
+        raw = None
+        for encoding in ["identity"] + available_encodings():
+            for warm in ((False,) if encoding == "identity" else (False, True)):
+                body, cpu_ms = asyncio.run(run(path, encoding, args.requests, warm))
+                raw = raw or body
+                label = "" if encoding == "identity" else ("cache warm" if warm else "cache cold")
+                extra = "" if encoding == "identity" or warm else \
+                    f"  (compression alone {compress_cpu_ms(raw, encoding, args.requests):.2f} ms)"
+                print(f"  {encoding:<9} {label:<11} {len(body) / 1024:9.1f} KiB on the wire "
+                      f"({len(body) / len(raw):6.1%})  {cpu_ms:7.2f} ms CPU/request{extra}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/bench_events_html.py
+"""
+Streamed /events HTML: time to first byte, total time and peak Python memory
+by row limit, next to rendering the same rows from a materialized list.
+
+    python -m benchmarks.bench_events_html --events 60000 --limits 1000 10000 50000
+
+Uses its own SQLite file unless DATABASE_URL is set.
+"""
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_events_html.db")
+
+from app.api import app, get_templates, _events_stmt, _event_row
+from app.db import ReadSessionLocal
+from app.migrate import migrate
+from benchmarks.bench_transform import synthetic_features
+from etl.load import load_events
+from etl.transform import features_to_df
+
+async def stream_events(limit: int):
+    """GET /events through the ASGI app; returns (ttfb_s, total_s, bytes, chunks)."""
+    query = f"limit={limit}".encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/events", "raw_path": b"/events", "query_string": query,
+        "root_path": "", "headers": [(b"host", b"bench")], "client": ("bench", 1), "server": ("bench", 80),
+    }
+    started = time.perf_counter()
+    ttfb, size, chunks = None, 0, 0
+
+    async def receive():
+        await asyncio.sleep(3600)   # the client never disconnects
+
+    async def send(message):
+        nonlocal ttfb, size, chunks
+        if message["type"] == "http.response.body" and message.get("body"):
+            ttfb = ttfb or time.perf_counter() - started
+            size += len(message["body"])
+            chunks += 1
+
+    await app(scope, receive, send)
+    return ttfb, time.perf_counter() - started, size, chunks
+
+def render_materialized(limit: int) -> int:
+    """The old approach: fetch every row into a list, then render the page in one go."""
+    with ReadSessionLocal() as session:
+        events = [_event_row(r) for r in session.execute(_events_stmt(0.0, 10.0).limit(limit))]
+    html = get_templates().get_template("events.html").render(events=events, scroll=False, chunk_url="")
+    return len(html.encode())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=60_000)
+    parser.add_argument("--limits", type=int, nargs="+", default=[1000, 10_000, 50_000])
+    args = parser.parse_args()
+
+    migrate()
+    load_events(features_to_df(synthetic_features(args.events)))
+
+    for limit in args.limits:
+        tracemalloc.start()
+        ttfb, total, size, chunks = asyncio.run(stream_events(limit))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        render_materialized(limit)
+        flat_s = time.perf_counter() - started
+        _, flat_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"limit={limit:<6} streamed: ttfb {ttfb * 1e3:7.1f} ms  total {total:6.2f}s  "
+              f"{size / 1e6:6.2f} MB in {chunks:4d} chunks  peak {peak / 1e6:6.1f} MB | "
+              f"materialized: first byte after {flat_s:6.2f}s  peak {flat_peak / 1e6:6.1f} MB")
+
+if __name__ == "__main__":
+    main()
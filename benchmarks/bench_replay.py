@@ -0,0 +1,69 @@
+# benchmarks/bench_replay.py
+"""
+Replay throughput: archive a run of overlapping all_day-style snapshots, then
+replay them into a fresh database with different worker counts.
+
+    python -m benchmarks.bench_replay --payloads 2000 --per-payload 300 --workers 1 4
+
+Each snapshot shares most of its events with the previous one, like the real
+feed polled every 15 minutes. Uses its own SQLite file unless DATABASE_URL is set.
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_replay.db")
+
+from sqlalchemy import text
+
+from app.db import engine
+from app.migrate import migrate
+from benchmarks.bench_transform import synthetic_features
+from etl.archive import archive_payload
+from etl.replay import replay_archive
+
+def build_archive(root: str, payloads: int, per_payload: int, step: int) -> int:
+    """Write `payloads` snapshots, each sliding `step` events forward; returns raw bytes archived."""
+    features = synthetic_features(payloads * step + per_payload)
+    started_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    total = 0
+    for i in range(payloads):
+        window = features[i * step:i * step + per_payload]
+        raw = json.dumps({"type": "FeatureCollection", "features": window}, separators=(",", ":")).encode()
+        archive_payload(raw, "synthetic", started_at + timedelta(minutes=15 * i), root=root)
+        total += len(raw)
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payloads", type=int, default=2000)
+    parser.add_argument("--per-payload", type=int, default=300)
+    parser.add_argument("--step", type=int, default=3, help="new events per snapshot")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="qw-archive-")
+    try:
+        started = time.perf_counter()
+        raw_bytes = build_archive(root, args.payloads, args.per_payload, args.step)
+        stored = sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(os.path.join(root, "objects")) for f in fs)
+        print(f"archived {args.payloads} payloads in {time.perf_counter() - started:.1f}s: "
+              f"{raw_bytes / 1e6:.1f} MB raw -> {stored / 1e6:.1f} MB zstd ({raw_bytes / stored:.1f}x)")
+
+        migrate(engine)
+        for workers in args.workers:
+            with engine.begin() as conn:
+                conn.execute(text("DELETE FROM fact_event"))
+            stats = replay_archive(workers=workers, root=root)
+            rate = stats["features"] / stats["elapsed_s"]
+            print(f"workers={workers:<3} {stats['elapsed_s']:7.2f}s  {rate:>10,.0f} features/s  "
+                  f"{raw_bytes / 1e6 / stats['elapsed_s']:6.1f} MB/s raw  loaded={stats['loaded']}")
+    finally:
+        shutil.rmtree(root)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# benchmarks/bench_sqlite.py
+"""
+SQLite under a concurrent load: API-style reads per second (and lock errors)
+while the batched loader writes, with the SQLite profile off and on.
+
+    python -m benchmarks.bench_sqlite --seed-events 20000 --load-events 50000 --readers 4
+
+Each profile runs in a fresh subprocess against its own database file, since
+engines pick up QW_SQLITE_TUNING at import time. The loader runs in a process
+of its own, like the ETL next to the API.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+def _setup(db: str):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db}"
+
+def loader(args):
+    _setup(args.db)
+    from sqlalchemy.exc import OperationalError
+
+    from benchmarks.bench_transform import synthetic_features
+    from etl.load import load_events
+    from etl.transform import features_to_df
+
+    # ids that don't collide with the seeded rows
+    incoming = features_to_df(synthetic_features(args.seed_events + args.load_events, seed=2)[args.seed_events:])
+    print("ready", flush=True)
+    started = time.perf_counter()
+    loaded = failed = 0
+    for start in range(0, len(incoming), args.batch):
+        batch = incoming.iloc[start:start + args.batch]
+        try:
+            load_events(batch)
+            loaded += len(batch)
+        except OperationalError:   # "database is locked": the batch is lost, as it would be in the ETL
+            failed += 1
+        print(f"{loaded} {failed} {time.perf_counter() - started}", flush=True)
+
+def child(args):
+    _setup(args.db)
+    from sqlalchemy.exc import OperationalError
+
+    from app.db import ReadSessionLocal, engine, read_engine
+    from app.api import _events_stmt
+    from app.migrate import migrate
+    from benchmarks.bench_transform import synthetic_features
+    from etl.load import load_events
+    from etl.transform import features_to_df
+
+    migrate()
+    load_events(features_to_df(synthetic_features(args.seed_events, seed=1)))
+
+    stop = threading.Event()
+    reads, errors, latencies = [0], [0], []
+    lock = threading.Lock()
+
+    def reader():
+        stmt = _events_stmt(4.0, 10.0).limit(200)
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                with ReadSessionLocal() as session:
+                    session.execute(stmt).all()
+                ok = True
+            except OperationalError:
+                ok = False
+            with lock:
+                if ok:
+                    reads[0] += 1
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors[0] += 1
+
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_sqlite", "--loader", "--db", args.db,
+         "--seed-events", str(args.seed_events), "--load-events", str(args.load_events), "--batch", str(args.batch)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    assert proc.stdout.readline().strip() == "ready"
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    progress = ["0 0 0"]
+    tail = threading.Thread(target=lambda: progress.extend(line.strip() for line in proc.stdout))
+    tail.start()
+    try:
+        # a starved writer can sit in SQLite's busy handler for minutes; cap the run
+        proc.wait(timeout=args.max_seconds)
+        stalled = ""
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+        stalled = f" (stalled, killed after {args.max_seconds}s)"
+    finally:
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for t in threads:
+            t.join()
+        tail.join()
+    loaded, failed, load_s = progress[-1].split()
+    load_s = float(load_s) if not stalled else elapsed
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e3 if latencies else float("nan")
+    with engine.connect() as conn:
+        journal = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+    print(f"journal={journal:<6} separate_reader={read_engine is not engine!s:<5}  loaded {loaded} events in "
+          f"{load_s:6.2f}s ({int(loaded) / load_s:8,.0f}/s){stalled}, {failed} batches locked out  "
+          f"reads {reads[0] / elapsed:7.1f}/s  p99 {p99:7.1f} ms  read lock errors {errors[0]}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed-events", type=int, default=20_000)
+    parser.add_argument("--load-events", type=int, default=50_000)
+    parser.add_argument("--batch", type=int, default=5_000, help="events per load_events call")
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--max-seconds", type=int, default=120, help="cap on the loader's run time")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--loader", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.loader:
+        loader(args)
+        return
+    if args.child:
+        child(args)
+        return
+
+    for tuning in ("0", "1"):
+        with tempfile.TemporaryDirectory() as tmp:
+            cmd = [sys.executable, "-m", "benchmarks.bench_sqlite", "--child", "--db", os.path.join(tmp, "bench.db"),
+                   "--seed-events", str(args.seed_events), "--load-events", str(args.load_events),
+                   "--batch", str(args.batch), "--readers", str(args.readers),
+                   "--max-seconds", str(args.max_seconds)]
+            print(f"QW_SQLITE_TUNING={tuning}: ", end="", flush=True)
+            subprocess.run(cmd, env={**os.environ, "QW_SQLITE_TUNING": tuning}, check=True)
+
+if __name__ == "__main__":
+    main()
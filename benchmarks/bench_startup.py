@@ -0,0 +1,65 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start benchmark: import time of the API and ETL entry points, plus the
+latency of the first API request, each measured in a fresh interpreter.
+
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --record bench_output.txt   # append a JSON line
+
+Run `python -m app.migrate` against the same DATABASE_URL first so the
+first request hits real tables.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# Each probe prints one JSON object with timings in milliseconds
+PROBES = {
+    "api": """
+import json, time
+t0 = time.perf_counter()
+import app.api
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(app.api.app)
+t2 = time.perf_counter()
+client.get("/health")
+t3 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1e3, "first_request_ms": (t3 - t2) * 1e3}))
+""",
+    "etl": """
+import json, time
+t0 = time.perf_counter()
+import etl.flow
+t1 = time.perf_counter()
+print(json.dumps({"import_ms": (t1 - t0) * 1e3}))
+""",
+}
+
+def run_probe(code: str) -> dict:
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--record", help="append results as a JSON line to this file")
+    args = parser.parse_args()
+
+    results = {"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "runs": args.runs}
+    for name, code in PROBES.items():
+        samples = [run_probe(code) for _ in range(args.runs)]
+        for metric in samples[0]:
+            median = statistics.median(s[metric] for s in samples)
+            results[f"{name}.{metric}"] = round(median, 1)
+            print(f"{name:4s} {metric:18s} median {median:8.1f} ms")
+
+    if args.record:
+        with open(args.record, "a") as fh:
+            fh.write(json.dumps(results) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/bench_transform.py
+"""
+Throughput of features_to_df + validate_df, serial vs. the process-pool path.
+
+    python -m benchmarks.bench_transform --features 200000 --shard-size 20000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import random
+import time
+
+from etl.parallel import transform_parallel
+
+PLACES = ["10 km NNE of Anza, CA", "45 km S of Whites City, New Mexico",
+          "Fiji region", "112 km W of Abepura, Indonesia", None]
+
+def synthetic_features(n: int, seed: int = 7, start: int = 0) -> list:
+    """`n` fake USGS features with ids syn{start:08d} onwards, one second apart."""
+    rnd = random.Random(seed)
+    base = 1_700_000_000_000
+    return [
+        {
+            "id": f"syn{i:08d}",
+            "properties": {
+                "time": base + i * 1000,
+                "updated": base + i * 1000 + 500,
+                "mag": round(rnd.uniform(-0.5, 7.5), 2),
+                "magType": rnd.choice(["ml", "md", "mb", "mww", None]),
+                "place": rnd.choice(PLACES),
+                "tsunami": 0,
+                "type": "earthquake",
+            },
+            "geometry": {"coordinates": [rnd.uniform(-180, 180), rnd.uniform(-90, 90), rnd.uniform(0, 600)]},
+        }
+        for i in range(start, start + n)
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--features", type=int, default=200_000)
+    parser.add_argument("--shard-size", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    features = synthetic_features(args.features)
+    baseline = None
+    for workers in sorted(set(args.workers)):
+        started = time.perf_counter()
+        df = transform_parallel(features, workers=workers, shard_size=args.shard_size)
+        elapsed = time.perf_counter() - started
+        assert len(df) == args.features
+        baseline = baseline or elapsed
+        print(f"workers={workers:2d}  {elapsed:7.2f}s  {args.features / elapsed:10,.0f} features/s  speedup x{baseline / elapsed:.2f}")
+
+if __name__ == "__main__":
+    main()
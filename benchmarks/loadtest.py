@@ -0,0 +1,333 @@
+# benchmarks/loadtest.py
+"""
+Load test for the API: a weighted query mix over /events.json, /events,
+/stats/by-country and /health, driven by concurrent async clients against a
+seeded database, with p50/p95/p99 per route checked against stored budgets.
+
+    python -m benchmarks.loadtest                                  # 1M events in ./loadtest.db, default mix
+    python -m benchmarks.loadtest --mix-from-log access.log --save-mix mix.json --no-gate
+    python -m benchmarks.loadtest --mix mix.json --duration 60 --concurrency 32 --no-gate
+    python -m benchmarks.loadtest --update-budgets                 # store this run (x --headroom) as the budgets
+
+The stored budgets are measured at the default --concurrency 8 with 1.25x
+headroom, so a 2x slowdown of any route fails. They are saved together with
+the run settings (concurrency, request count or duration, seeded events, mix,
+target) and the machine (host, CPUs, architecture). The gate refuses to judge
+a run whose settings or machine differ and exits 2; re-baseline with
+--update-budgets on the machine that runs the gate, or pass --no-gate to only
+print the report.
+
+The mix (benchmarks/loadtest_mix.json) gives each route a weight and each
+query parameter a distribution: a list of values, {"values": [...],
+"weights": [...]}, or {"uniform": [lo, hi], "round": n}. --mix-from-log
+builds the same structure from uvicorn or combined-format access logs.
+Requests are drawn from a seeded RNG, so a mix replays identically.
+
+Without --base-url the app runs in-process and reads DATABASE_URL
+(default sqlite:///./loadtest.db), which is seeded with --events synthetic
+events the first time. Exits 1 when any budget is exceeded.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MIX = os.path.join(HERE, "loadtest_mix.json")
+DEFAULT_BUDGETS = os.path.join(HERE, "loadtest_budgets.json")
+ROUTES = ("/events.json", "/events", "/stats/by-country", "/health")
+ALL = "*"   # report/budget key for all routes together
+
+# request line in uvicorn ("GET /path HTTP/1.1" 200) and common/combined log formats
+_LOG_LINE = re.compile(r'"GET (?P<target>\S+) HTTP/[\d.]+"\s+(?P<status>\d{3})')
+
+def _sample_param(spec, rnd: random.Random):
+    if isinstance(spec, list):
+        return rnd.choice(spec)
+    if "uniform" in spec:
+        lo, hi = spec["uniform"]
+        return round(rnd.uniform(lo, hi), spec.get("round", 1))
+    return rnd.choices(spec["values"], weights=spec.get("weights"))[0]
+
+class QueryMix:
+    """Weighted routes, each with independent per-parameter distributions; a None value omits the parameter."""
+
+    def __init__(self, routes: list):
+        self.routes = [r for r in routes if r.get("weight", 1) > 0]
+        if not self.routes:
+            raise ValueError("Query mix has no routes with a positive weight")
+        self._weights = [r.get("weight", 1) for r in self.routes]
+
+    @classmethod
+    def load(cls, path: str) -> "QueryMix":
+        with open(path, encoding="utf-8") as fh:
+            return cls(json.load(fh)["routes"])
+
+    @classmethod
+    def from_access_log(cls, lines, routes=ROUTES) -> "QueryMix":
+        """Route frequencies and parameter value frequencies as seen in an access log."""
+        hits = Counter()
+        values = defaultdict(lambda: defaultdict(Counter))
+        for line in lines:
+            m = _LOG_LINE.search(line)
+            if not m:
+                continue
+            target = urlsplit(m["target"])
+            if target.path not in routes:
+                continue
+            hits[target.path] += 1
+            for name, value in parse_qsl(target.query):
+                values[target.path][name][value] += 1
+
+        mix = []
+        for path, n in hits.most_common():
+            params = {}
+            for name, seen in values[path].items():
+                spec = {"values": list(seen), "weights": list(seen.values())}
+                if sum(seen.values()) < n:
+                    # requests that left the parameter out
+                    spec["values"].append(None)
+                    spec["weights"].append(n - sum(seen.values()))
+                params[name] = spec
+            mix.append({"path": path, "weight": n, "params": params})
+        return cls(mix)
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump({"routes": self.routes}, fh, indent=2)
+            fh.write("\n")
+
+    def sample(self, rnd: random.Random) -> str:
+        route = rnd.choices(self.routes, weights=self._weights)[0]
+        params = {name: _sample_param(spec, rnd) for name, spec in route.get("params", {}).items()}
+        query = urlencode({k: v for k, v in params.items() if v is not None})
+        return f"{route['path']}?{query}" if query else route["path"]
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile (q in 0..100) of an ascending list."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def _route_stats(latencies: list, errors: int, elapsed_s: float) -> dict:
+    latencies = sorted(latencies)
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "rps": round(total / elapsed_s, 1) if elapsed_s else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else float("nan"),
+    }
+
+def summarize(latencies: dict, errors: dict, elapsed_s: float) -> dict:
+    """Per-route stats from {route: [ms, ...]} and {route: error count}, plus ALL for the whole run."""
+    report = {
+        route: _route_stats(latencies.get(route, []), errors.get(route, 0), elapsed_s)
+        for route in sorted(set(latencies) | set(errors))
+    }
+    report[ALL] = _route_stats(
+        [ms for values in latencies.values() for ms in values], sum(errors.values()), elapsed_s,
+    )
+    return report
+
+def check_budgets(report: dict, budgets: dict) -> list:
+    """Readable budget violations; every budget is an upper bound on a report metric."""
+    failures = []
+    for route, limits in budgets.items():
+        stats = report.get(route)
+        if stats is None:   # not in this mix
+            continue
+        for metric, limit in limits.items():
+            value = stats.get(metric)
+            if value is None or math.isnan(value):
+                continue
+            if value > limit:
+                failures.append(f"{route} {metric} {value} > budget {limit}")
+    return failures
+
+def run_settings(args) -> dict:
+    """What a set of budgets was measured under: the load shape, its target, and this machine."""
+    return {
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "duration": args.duration,
+        "events": args.events,
+        "mix": os.path.basename(args.mix_from_log or args.mix),
+        "target": args.base_url or os.environ.get("DATABASE_URL", "").split(":", 1)[0],
+        "machine": {"host": platform.node(), "cpus": os.cpu_count(), "arch": platform.machine()},
+    }
+
+def settings_mismatch(stored: dict, current: dict) -> list:
+    """Settings that differ between the budgets' run and this one, as readable strings."""
+    mismatches = []
+    for key in sorted(set(stored) | set(current)):
+        if stored.get(key) != current.get(key):
+            mismatches.append(f"{key}: budgets {stored.get(key)!r}, this run {current.get(key)!r}")
+    return mismatches
+
+def make_budgets(report: dict, headroom: float, floor_ms: float = 10.0) -> dict:
+    """Budgets from a run: its percentiles times `headroom` (at least `floor_ms`, above timer noise), and no errors."""
+    budgets = {}
+    for route, stats in report.items():
+        if stats["requests"] == stats["errors"]:
+            continue
+        budgets[route] = {m: round(max(stats[m] * headroom, floor_ms), 1) for m in ("p50_ms", "p95_ms", "p99_ms")}
+    budgets.setdefault(ALL, {})["error_rate"] = 0.0
+    return budgets
+
+async def run_load(client, mix: QueryMix, requests: int = None, duration: float = None,
+                   concurrency: int = 16, seed: int = 1) -> dict:
+    """Closed-loop load: `concurrency` clients issue requests back to back until `requests` or `duration` runs out."""
+    import httpx
+
+    rnd = random.Random(seed)
+    latencies, errors = defaultdict(list), Counter()
+    issued = 0
+    deadline = time.perf_counter() + duration if duration else None
+
+    async def client_loop():
+        nonlocal issued
+        while (requests is None or issued < requests) and (deadline is None or time.perf_counter() < deadline):
+            issued += 1
+            url = mix.sample(rnd)
+            route = urlsplit(url).path
+            started = time.perf_counter()
+            try:
+                response = await client.get(url)   # reads the whole body, streamed pages included
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies[route].append((time.perf_counter() - started) * 1e3)
+            else:
+                errors[route] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+def seed_database(events: int, chunk: int = 100_000) -> int:
+    """Top the database up to `events` synthetic events; returns how many were loaded."""
+    from sqlalchemy import func, select
+
+    from app.db import SessionLocal
+    from app.migrate import migrate
+    from app.models import FactEvent
+    from benchmarks.bench_transform import synthetic_features
+    from etl.load import DimCache, load_events
+    from etl.transform import features_to_df
+
+    migrate()
+    with SessionLocal() as session:
+        have = session.scalar(select(func.count()).select_from(FactEvent))
+    cache = DimCache()
+    for start in range(have, events, chunk):
+        n = min(chunk, events - start)
+        load_events(features_to_df(synthetic_features(n, seed=start, start=start)), cache)
+        print(f"seeded {start + n:,}/{events:,} events", flush=True)
+    return max(0, events - have)
+
+async def _drive(args, mix: QueryMix) -> dict:
+    import httpx
+
+    if args.base_url:
+        transport, base_url = None, args.base_url
+    else:
+        from app.api import app
+        transport, base_url = httpx.ASGITransport(app=app), "http://loadtest"
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        if args.warmup:
+            await run_load(client, mix, requests=args.warmup, concurrency=args.concurrency, seed=args.seed + 1)
+        return await run_load(client, mix, args.requests, args.duration, args.concurrency, args.seed)
+
+def _print_report(report: dict):
+    print(f"{'route':20s} {'requests':>8s} {'errors':>6s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'max ms':>8s}")
+    for route, s in report.items():
+        print(f"{route:20s} {s['requests']:8d} {s['errors']:6d} {s['rps']:8.1f} {s['p50_ms']:8.1f} "
+              f"{s['p95_ms']:8.1f} {s['p99_ms']:8.1f} {s['max_ms']:8.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="query mix JSON")
+    parser.add_argument("--mix-from-log", help="build the mix from this access log instead")
+    parser.add_argument("--save-mix", help="write the mix in use to this file")
+    parser.add_argument("--budgets", default=DEFAULT_BUDGETS, help="latency budgets JSON")
+    parser.add_argument("--update-budgets", action="store_true", help="overwrite --budgets from this run")
+    parser.add_argument("--no-gate", action="store_true", help="print the report without checking budgets")
+    parser.add_argument("--headroom", type=float, default=1.25, help="budget = measured x headroom (--update-budgets), below 2")
+    parser.add_argument("--base-url", help="load a running server instead of the in-process app")
+    parser.add_argument("--events", type=int, default=1_000_000, help="seed the database up to this many events")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--duration", type=float, default=None, help="seconds; overrides --requests")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=40, help="unmeasured requests sent first")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--record", help="append the report as a JSON line to this file")
+    args = parser.parse_args()
+    if args.duration:
+        args.requests = None
+    if not 1 <= args.headroom < 2:
+        parser.error("--headroom must be in [1, 2) so that a 2x slowdown fails the budgets")
+
+    if args.mix_from_log:
+        with open(args.mix_from_log, encoding="utf-8", errors="replace") as fh:
+            mix = QueryMix.from_access_log(fh)
+    else:
+        mix = QueryMix.load(args.mix)
+    if args.save_mix:
+        mix.save(args.save_mix)
+
+    if not args.base_url:
+        os.environ.setdefault("DATABASE_URL", "sqlite:///./loadtest.db")
+        if args.events:
+            seed_database(args.events)
+
+    report = asyncio.run(_drive(args, mix))
+    _print_report(report)
+    if args.record:
+        with open(args.record, "a") as fh:
+            fh.write(json.dumps({"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "loadtest": report}) + "\n")
+
+    settings = run_settings(args)
+    if args.update_budgets:
+        with open(args.budgets, "w", encoding="utf-8") as fh:
+            json.dump({"settings": settings, "budgets": make_budgets(report, args.headroom)}, fh, indent=2)
+            fh.write("\n")
+        print(f"budgets written to {args.budgets}")
+        return
+    if args.no_gate:
+        return
+    if not os.path.exists(args.budgets):
+        print(f"no budgets at {args.budgets}; run with --update-budgets to store some")
+        return
+    with open(args.budgets, encoding="utf-8") as fh:
+        stored = json.load(fh)
+    mismatches = settings_mismatch(stored.get("settings", {}), settings)
+    if mismatches:
+        for mismatch in mismatches:
+            print(f"SETTINGS DIFFER  {mismatch}")
+        print(f"refusing to gate against {args.budgets}; re-baseline with --update-budgets")
+        raise SystemExit(2)
+    failures = check_budgets(report, stored["budgets"])
+    for failure in failures:
+        print(f"OVER BUDGET  {failure}")
+    if failures:
+        raise SystemExit(1)
+    print("all routes within budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+# etl/alerts.py
+
+import json
+import logging
+import math
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db import engine
+from app.models import AlertSubscription, AlertDelivery
+from etl.notify import get_notifier
+
+# Geofence alerts: active subscriptions are held in a lat/lon grid so each
+# loaded event is only tested against the zones whose bounding box covers
+# its cell. Within a cell, radius zones are tested in one vectorized pass.
+ALERTS_ENABLED = os.getenv("QW_ALERTS", "1") == "1"
+GRID_CELL_DEG = float(os.getenv("QW_ALERT_GRID_DEG", "1.0"))
+INDEX_TTL_S = float(os.getenv("QW_ALERT_INDEX_TTL", "60"))   # reload subscriptions at most this often
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 111.32
+
+class Zone:
+    """One subscription's geometry, threshold and delivery channel."""
+
+    __slots__ = ("subscription_id", "name", "min_magnitude", "lat", "lon", "radius_km",
+                 "poly_lon", "poly_lat", "channel", "target")
+
+    def __init__(self, subscription_id, min_magnitude=0.0, lat=None, lon=None, radius_km=None,
+                 polygon=None, name=None, channel="log", target=None):
+        self.subscription_id = subscription_id
+        self.name = name
+        self.min_magnitude = float(min_magnitude or 0.0)
+        self.lat, self.lon, self.radius_km = lat, lon, radius_km
+        self.poly_lon = self.poly_lat = None
+        if polygon:
+            pts = np.asarray(json.loads(polygon) if isinstance(polygon, str) else polygon, dtype=float)
+            self.poly_lon, self.poly_lat = pts[:, 0], pts[:, 1]
+        elif radius_km is None or lat is None or lon is None:
+            raise ValueError(f"Subscription {subscription_id} needs a polygon or center + radius_km")
+        self.channel = channel
+        self.target = target
+
+    @classmethod
+    def from_model(cls, sub: AlertSubscription):
+        return cls(sub.subscription_id, sub.min_magnitude, sub.center_lat, sub.center_lon, sub.radius_km,
+                   sub.polygon, sub.name, sub.channel, sub.target)
+
+    @property
+    def is_polygon(self) -> bool:
+        return self.poly_lon is not None
+
+    def bbox(self):
+        """(min_lat, max_lat, min_lon, max_lon); lon may run past ±180 for zones across the antimeridian."""
+        if self.is_polygon:
+            return self.poly_lat.min(), self.poly_lat.max(), self.poly_lon.min(), self.poly_lon.max()
+        dlat = self.radius_km / KM_PER_DEG_LAT
+        min_lat, max_lat = self.lat - dlat, self.lat + dlat
+        if min_lat <= -90 or max_lat >= 90:
+            return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+        dlon = dlat / math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+        if dlon >= 180:
+            return min_lat, max_lat, -180.0, 180.0
+        return min_lat, max_lat, self.lon - dlon, self.lon + dlon
+
+    def contains(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        if self.is_polygon:
+            return _in_polygon(lat, lon, self.poly_lat, self.poly_lon)
+        return _haversine_km(lat[:, None], lon[:, None], np.array([self.lat]), np.array([self.lon]))[:, 0] <= self.radius_km
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def _in_polygon(lat, lon, poly_lat, poly_lon):
+    """Even-odd ray casting for many points against one polygon (planar lon/lat)."""
+    inside = np.zeros(len(lat), dtype=bool)
+    j = len(poly_lat) - 1
+    for i in range(len(poly_lat)):
+        yi, yj, xi, xj = poly_lat[i], poly_lat[j], poly_lon[i], poly_lon[j]
+        crosses = (yi > lat) != (yj > lat)
+        if crosses.any():
+            x_at = (xj - xi) * (lat - yi) / ((yj - yi) or 1e-12) + xi
+            inside ^= crosses & (lon < x_at)
+        j = i
+    return inside
+
+class _Cell:
+    """Zones overlapping one grid cell, with radius zones packed into arrays."""
+
+    __slots__ = ("r_slot", "r_lat", "r_lon", "r_km", "r_min_mag", "polygons")
+
+    def __init__(self, slots: np.ndarray, packed: dict, zones: list):
+        radius = slots[~packed["is_polygon"][slots]]
+        self.r_slot = radius
+        self.r_lat, self.r_lon = packed["lat"][radius], packed["lon"][radius]
+        self.r_km, self.r_min_mag = packed["radius_km"][radius], packed["min_magnitude"][radius]
+        self.polygons = [(int(i), zones[i]) for i in slots[packed["is_polygon"][slots]]]
+
+    def match(self, lat, lon, mag):
+        """(zone slots, event positions) of every hit among events already in this cell."""
+        slots, found = [], []
+        if len(self.r_slot):
+            hit = _haversine_km(lat[:, None], lon[:, None], self.r_lat[None, :], self.r_lon[None, :]) <= self.r_km
+            hit &= mag[:, None] >= self.r_min_mag
+            ev, z = np.nonzero(hit)
+            slots.append(self.r_slot[z])
+            found.append(ev)
+        for slot, zone in self.polygons:
+            pos = np.flatnonzero(mag >= zone.min_magnitude)
+            pos = pos[zone.contains(lat[pos], lon[pos])]
+            slots.append(np.full(len(pos), slot, dtype=np.int64))
+            found.append(pos)
+        return slots, found
+
+class GridIndex:
+    """Uniform lat/lon grid mapping each cell to the zones whose bbox covers it."""
+
+    def __init__(self, zones, cell_deg: float = None):
+        self.cell_deg = cell_deg or GRID_CELL_DEG
+        self.n_lat = int(math.ceil(180 / self.cell_deg))
+        self.n_lon = int(math.ceil(360 / self.cell_deg))
+        self.zones = list(zones)
+        buckets = defaultdict(list)
+        for slot, zone in enumerate(self.zones):
+            for key in self._cover(*zone.bbox()):
+                buckets[key].append(slot)
+        packed = {
+            "is_polygon": np.array([z.is_polygon for z in self.zones], dtype=bool),
+            "lat": np.array([np.nan if z.is_polygon else z.lat for z in self.zones], dtype=float),
+            "lon": np.array([np.nan if z.is_polygon else z.lon for z in self.zones], dtype=float),
+            "radius_km": np.array([np.nan if z.is_polygon else z.radius_km for z in self.zones], dtype=float),
+            "min_magnitude": np.array([z.min_magnitude for z in self.zones], dtype=float),
+        }
+        self._cells = {
+            key: _Cell(np.array(slots, dtype=np.int64), packed, self.zones) for key, slots in buckets.items()
+        }
+
+    def __len__(self):
+        return len(self.zones)
+
+    def _cover(self, min_lat, max_lat, min_lon, max_lon):
+        i0 = max(0, int((min_lat + 90) // self.cell_deg))
+        i1 = min(self.n_lat - 1, int((max_lat + 90) // self.cell_deg))
+        if max_lon - min_lon >= 360:
+            cols = range(self.n_lon)
+        else:
+            j0 = int(math.floor((min_lon + 180) / self.cell_deg))
+            j1 = int(math.floor((max_lon + 180) / self.cell_deg))
+            cols = {j % self.n_lon for j in range(j0, j1 + 1)}
+        return [i * self.n_lon + j for i in range(i0, i1 + 1) for j in cols]
+
+    def cell_keys(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        i = np.clip(((lat + 90) // self.cell_deg).astype(np.int64), 0, self.n_lat - 1)
+        j = np.clip((((lon + 180) % 360) // self.cell_deg).astype(np.int64), 0, self.n_lon - 1)
+        return i * self.n_lon + j
+
+    def match(self, lat, lon, mag) -> list:
+        """All (zone, event positions) pairs; positions index into the input arrays."""
+        lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+        mag = np.asarray(mag, dtype=float)
+        valid = ~(np.isnan(lat) | np.isnan(lon) | np.isnan(mag))
+        positions = np.flatnonzero(valid)
+        if not len(positions) or not self._cells:
+            return []
+        keys = self.cell_keys(lat[positions], lon[positions])
+        order = np.argsort(keys, kind="stable")
+        keys, positions = keys[order], positions[order]
+        bounds = np.flatnonzero(np.diff(keys)) + 1
+        slots, found = [], []
+        for group in np.split(np.arange(len(keys)), bounds):
+            cell = self._cells.get(int(keys[group[0]]))
+            if cell is None:
+                continue
+            pos = positions[group]
+            cell_slots, cell_found = cell.match(lat[pos], lon[pos], mag[pos])
+            slots.extend(cell_slots)
+            found.extend(pos[f] for f in cell_found)
+        if not slots:
+            return []
+        # group all hits by zone in one sort instead of per-zone bookkeeping
+        slots, found = np.concatenate(slots), np.concatenate(found)
+        if not len(slots):
+            return []
+        order = np.lexsort((found, slots))
+        slots, found = slots[order], found[order]
+        starts = np.flatnonzero(np.r_[True, np.diff(slots) != 0])
+        return [(self.zones[int(slots[s])], pos) for s, pos in zip(starts, np.split(found, starts[1:]))]
+
+# --- Subscription index lifecycle ---
+_cached = {"index": None, "loaded_at": 0.0}
+
+def load_index(bind=None) -> GridIndex:
+    """Build the grid from all active subscriptions in the DB; malformed ones are logged and skipped."""
+    zones = []
+    with Session(bind or engine) as session:
+        subs = session.execute(select(AlertSubscription).where(AlertSubscription.active == 1)).scalars().all()
+        for sub in subs:
+            try:
+                zones.append(Zone.from_model(sub))
+            except (ValueError, TypeError, IndexError) as e:
+                # one bad row must not stop alerting for every other subscription
+                logging.error(f"Skipping invalid alert subscription {sub.subscription_id}: {e}")
+    return GridIndex(zones)
+
+def get_index(bind=None, max_age_s: float = None) -> GridIndex:
+    """Process-wide index, rebuilt when older than QW_ALERT_INDEX_TTL."""
+    max_age_s = INDEX_TTL_S if max_age_s is None else max_age_s
+    if _cached["index"] is None or time.monotonic() - _cached["loaded_at"] > max_age_s:
+        _cached["index"] = load_index(bind)
+        _cached["loaded_at"] = time.monotonic()
+    return _cached["index"]
+
+# --- Matching + delivery ---
+def _format(zone: Zone, rows) -> str:
+    label = zone.name or f"subscription {zone.subscription_id}"
+    lines = [f"🌋 QuakeWatch alert for {label}: {len(rows)} event(s) ≥ M{zone.min_magnitude:g}"]
+    for r in rows:
+        when = r["time_utc"].isoformat() if r["time_utc"] is not None else "?"
+        lines.append(f"• M{r['magnitude']:.1f} {r['raw_place'] or 'unknown location'} ({when}) [{r['event_id']}]")
+    return "\n".join(lines)
+
+def dispatch_alerts(df, index: GridIndex = None, bind=None) -> int:
+    """
+    Match new/updated events against the subscription index and notify each
+    matching subscription once per event. Returns the number of deliveries.
+    """
+    if df is None or df.empty:
+        return 0
+    bind = bind or engine
+    index = index if index is not None else get_index(bind)
+    if not len(index):
+        return 0
+
+    df = df.reset_index(drop=True)
+    hits = index.match(df["latitude"].to_numpy(), df["longitude"].to_numpy(), df["magnitude"].to_numpy())
+    if not hits:
+        return 0
+
+    delivered = 0
+    with Session(bind) as session:
+        event_ids = list(df["event_id"].unique())
+        seen = set()
+        for start in range(0, len(event_ids), 1000):
+            chunk = event_ids[start:start + 1000]
+            seen.update((sub_id, ev_id) for sub_id, ev_id in session.execute(
+                select(AlertDelivery.subscription_id, AlertDelivery.event_id).where(AlertDelivery.event_id.in_(chunk))
+            ))
+        now = datetime.now(timezone.utc)
+        for zone, positions in hits:
+            rows = [r for r in df.iloc[positions].to_dict(orient="records")
+                    if (zone.subscription_id, r["event_id"]) not in seen]
+            if not rows:
+                continue
+            try:
+                get_notifier(zone.channel, zone.target).send(
+                    _format(zone, rows),
+                    {"subscription_id": zone.subscription_id, "event_ids": [r["event_id"] for r in rows]},
+                )
+            except Exception as e:
+                logging.error(f"Alert delivery to subscription {zone.subscription_id} failed: {e}")
+                continue
+            session.add_all(AlertDelivery(subscription_id=zone.subscription_id, event_id=r["event_id"], sent_at=now)
+                            for r in rows)
+            delivered += len(rows)
+        session.commit()
+    return delivered
+
+def run_alerts(df, index: GridIndex = None) -> int:
+    """dispatch_alerts for the loaders: alerting problems are logged, never fail a load."""
+    if not ALERTS_ENABLED:
+        return 0
+    try:
+        n = dispatch_alerts(df, index)
+        if n:
+            logging.info(f"Sent {n} geofence alert(s)")
+        return n
+    except Exception as e:
+        logging.error(f"Geofence alerting failed: {e}")
+        return 0
@@ -0,0 +1,93 @@
+# etl/archive.py
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+
+try:
+    import zstandard as zstd
+except ImportError:  # optional: without it, payloads are simply not archived
+    zstd = None
+
+# Raw feed archive: every fetched GeoJSON payload is stored once, zstd
+# compressed, under its SHA-256 (objects/ab/abcdef....json.zst), and each fetch
+# is appended to a per-day JSONL index (index/2024-01-31.jsonl). Replaying the
+# index in order reproduces the history the pipeline saw, without the network.
+ARCHIVE_ENABLED = os.getenv("QW_ARCHIVE", "1") == "1"
+ARCHIVE_DIR = os.getenv("QW_ARCHIVE_DIR", "data/raw")
+ARCHIVE_LEVEL = int(os.getenv("QW_ARCHIVE_LEVEL", "10"))   # zstd level; feeds compress ~10x at the default
+
+_index_lock = threading.Lock()
+
+def object_path(digest: str, root: str = None) -> str:
+    return os.path.join(root or ARCHIVE_DIR, "objects", digest[:2], f"{digest}.json.zst")
+
+def _index_path(day: str, root: str = None) -> str:
+    return os.path.join(root or ARCHIVE_DIR, "index", f"{day}.jsonl")
+
+def archive_payload(raw: bytes, url: str, fetched_at: datetime = None, root: str = None) -> str:
+    """
+    Store one raw feed payload and record the fetch in the index.
+
+    Identical payloads share one object; every call still gets an index
+    entry. Returns the payload's SHA-256 hex digest.
+    """
+    if zstd is None:
+        raise RuntimeError("zstandard is not installed; cannot archive feed payloads")
+    fetched_at = fetched_at or datetime.now(timezone.utc)
+    digest = hashlib.sha256(raw).hexdigest()
+    path = object_path(digest, root)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write-then-rename so a crash never leaves a truncated object behind
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(zstd.ZstdCompressor(level=ARCHIVE_LEVEL).compress(raw))
+        os.replace(tmp, path)
+
+    entry = {"fetched_at": fetched_at.isoformat(), "sha256": digest, "url": url, "bytes": len(raw)}
+    index = _index_path(fetched_at.strftime("%Y-%m-%d"), root)
+    with _index_lock:
+        os.makedirs(os.path.dirname(index), exist_ok=True)
+        with open(index, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(entry, separators=(",", ":")) + "\n")
+    return digest
+
+def try_archive(raw: bytes, url: str):
+    """archive_payload for extract: a full disk or missing zstandard must not stop ingestion."""
+    if not ARCHIVE_ENABLED:
+        return None
+    try:
+        return archive_payload(raw, url)
+    except Exception as e:
+        logging.error(f"Archiving feed payload failed: {e}")
+        return None
+
+def iter_index(since: datetime = None, until: datetime = None, root: str = None):
+    """Yield index entries in fetch order, optionally limited to [since, until)."""
+    index_dir = os.path.join(root or ARCHIVE_DIR, "index")
+    if not os.path.isdir(index_dir):
+        return
+    for name in sorted(os.listdir(index_dir)):
+        day = name.removesuffix(".jsonl")
+        # day files can be skipped wholesale by name
+        if since and day < since.strftime("%Y-%m-%d"):
+            continue
+        if until and day > until.strftime("%Y-%m-%d"):
+            break
+        with open(os.path.join(index_dir, name), encoding="utf-8") as fh:
+            entries = [json.loads(line) for line in fh if line.strip()]
+        entries.sort(key=lambda e: e["fetched_at"])
+        for entry in entries:
+            at = datetime.fromisoformat(entry["fetched_at"])
+            if (since and at < since) or (until and at >= until):
+                continue
+            yield entry
+
+def read_payload(digest: str, root: str = None) -> bytes:
+    """Decompressed payload bytes for an archived digest."""
+    with open(object_path(digest, root), "rb") as fh:
+        return zstd.ZstdDecompressor().decompress(fh.read())
@@ -1,25 +1,62 @@
 # etl/extract.py
 
 import os
+import json
 import requests
 import logging
 
+from etl.archive import try_archive
+
 # USGS real-time feed (all earthquakes in the past day)
 USGS_FEED = os.getenv(
     "USGS_FEED",
     "https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/all_day.geojson",
 )
 
-def fetch_events():
+# Smaller feed polled by the ingest daemon (all earthquakes in the past hour)
+USGS_FEED_HOURLY = os.getenv(
+    "USGS_FEED_HOURLY",
+    "https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/all_hour.geojson",
+)
+
+def fetch_events(session: requests.Session = None, url: str = None):
     """Fetch recent earthquake events from USGS GeoJSON feed."""
+    features, _ = fetch_feed(session=session, url=url)
+    return features
+
+def fetch_feed(session: requests.Session = None, url: str = None, validators: dict = None):
+    """
+    Fetch a USGS GeoJSON feed, optionally as a conditional GET.
+
+    `validators` holds the ETag / Last-Modified values from a previous call.
+    Returns (features, validators); features is None when the server answered
+    304 Not Modified, i.e. the feed has not changed since the last poll.
+    """
+    url = url or USGS_FEED
+    http = session or requests
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
     try:
-        logging.info(f"Fetching data from {USGS_FEED}")
-        response = requests.get(USGS_FEED, timeout=30)
+        logging.info(f"Fetching data from {url}")
+        response = http.get(url, headers=headers, timeout=30)
+        if response.status_code == 304:
+            return None, validators
         response.raise_for_status()
-        data = response.json()
+        raw = response.content
+        data = json.loads(raw)
         if "features" not in data:
             raise ValueError("Unexpected format: 'features' key not found.")
-        return data["features"]
+        # keep the exact bytes so history can be replayed later (etl/archive.py)
+        try_archive(raw, url)
+        new_validators = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        return data["features"], new_validators
     except requests.RequestException as e:
         logging.error(f"Failed to fetch events: {e}")
         raise
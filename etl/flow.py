@@ -1,61 +1,159 @@
 # etl/flow.py
 
 import os
-import json
+import time
+import logging
+import argparse
+from functools import lru_cache
 import requests
-import prefect
-from prefect import task, flow
-from etl.extract import fetch_events
+from etl.extract import fetch_events, fetch_feed, USGS_FEED_HOURLY
 from etl.transform import features_to_df, validate_df
-from etl.load import init_db, upsert_events
+from etl.parallel import transform_parallel
+from etl.load import init_db, load_events, changed_events, DimCache
+from etl.notify import notify
+from etl.alerts import run_alerts, ALERTS_ENABLED
+from app.migrate import auto_migrate_enabled
 
-# Optional Slack alerting
-SLACK_WEBHOOK = os.getenv("PREFECT_SLACK_WEBHOOK_URL")
+# --- Pipeline steps (plain functions; wrapped as Prefect tasks on demand) ---
+def extract() -> list:
+    return fetch_events()
+
+def transform(features: list):
+    # serial unless QW_TRANSFORM_WORKERS asks for a process pool on backfill-sized batches
+    return transform_parallel(features)
+
+def load(df):
+    # schema is created once by `python -m app.migrate`, not on every run
+    changed = changed_events(df) if ALERTS_ENABLED else None
+    n = load_events(df)
+    if changed is not None:
+        run_alerts(changed)
+    return n
+
+@lru_cache(maxsize=1)
+def _build_flow():
+    """Import Prefect and build the tasks/flow only when the flow is actually run."""
+    import prefect
+    from prefect import task, flow
+
+    t_extract = task(retries=3, retry_delay_seconds=10, log_prints=True)(extract)
+    t_transform = task(log_prints=True)(transform)
+    t_load = task(log_prints=True)(load)
 
-def notify(msg: str):
-    """Send message to Slack if webhook is configured."""
-    if SLACK_WEBHOOK:
+    @flow(name="quakewatch-flow")
+    def run_pipeline():
+        logger = prefect.get_run_logger()
         try:
-            response = requests.post(
-                SLACK_WEBHOOK,
-                headers={"Content-Type": "application/json"},
-                data=json.dumps({"text": msg}),
-                timeout=10
-            )
-            response.raise_for_status()
+            feats = t_extract()
+            df = t_transform(feats)
+            n = t_load(df)
+            msg = f"✅ QuakeWatch loaded {n} events."
+            logger.info(msg)
+            notify(msg)
         except Exception as e:
-            print(f"Slack notification failed: {e}")
+            err = f"❌ QuakeWatch failed: {e}"
+            logger.error(err)
+            notify(err)
+            raise
 
-@task(retries=3, retry_delay_seconds=10, log_prints=True)
-def t_extract() -> list:
-    return fetch_events()
+    return {"t_extract": t_extract, "t_transform": t_transform, "t_load": t_load, "run_pipeline": run_pipeline}
+
+def __getattr__(name):
+    # `from etl.flow import run_pipeline` still works; Prefect loads on first access
+    if name in ("t_extract", "t_transform", "t_load", "run_pipeline"):
+        return _build_flow()[name]
+    raise AttributeError(name)
+
+# --- Ingest daemon (high-frequency micro-batches) ---
+# Polls the hourly feed in a loop, reusing the engine, HTTP session and
+# dimension cache, and loads only events that are new or were updated.
+POLL_INTERVAL = float(os.getenv("QW_POLL_INTERVAL", "15"))
+POLL_MAX_INTERVAL = float(os.getenv("QW_POLL_MAX_INTERVAL", "120"))
+POLL_BACKOFF = float(os.getenv("QW_POLL_BACKOFF", "2.0"))
+
+log = logging.getLogger("quakewatch.daemon")
 
-@task(log_prints=True)
-def t_transform(features: list):
-    df = features_to_df(features)
-    return validate_df(df)
-
-@task(log_prints=True)
-def t_load(df):
-    init_db()
-    upsert_events(df)
-    return len(df)
-
-@flow(name="quakewatch-flow")
-def run_pipeline():
-    logger = prefect.get_run_logger()
-    try:
-        feats = t_extract()
-        df = t_transform(feats)
-        n = t_load(df)
-        msg = f"✅ QuakeWatch loaded {n} events."
-        logger.info(msg)
-        notify(msg)
-    except Exception as e:
-        err = f"❌ QuakeWatch failed: {e}"
-        logger.error(err)
-        notify(err)
-        raise
+def _delta(df, seen: dict):
+    """Rows whose event_id is new or whose updated_at moved since the last cycle."""
+    previous = df["event_id"].map(seen)
+    return df[previous.isna() | (previous != df["updated_at"])]
+
+def run_cycle(http: requests.Session, cache: DimCache, seen: dict, validators: dict = None, url: str = None) -> dict:
+    """Run one poll -> transform -> delta load cycle and report its timings."""
+    started = time.perf_counter()
+    stats = {"fetched": 0, "loaded": 0, "changed": False, "validators": validators}
+
+    feats, stats["validators"] = fetch_feed(session=http, url=url or USGS_FEED_HOURLY, validators=validators)
+    stats["fetch_s"] = time.perf_counter() - started
+    if feats:
+        stats["fetched"] = len(feats)
+        df = validate_df(features_to_df(feats))
+        delta = _delta(df, seen)
+        stats["transform_s"] = time.perf_counter() - started - stats["fetch_s"]
+        if len(delta):
+            load_events(delta, cache)
+            run_alerts(delta)   # uses the cached subscription index; no-op with QW_ALERTS=0
+            stats["loaded"] = len(delta)
+            stats["changed"] = True
+            stats["lag_s"] = time.time() - delta["updated_at"].max().timestamp()
+        # all_hour only ever holds the last hour, so the feed itself bounds `seen`
+        seen.clear()
+        seen.update(zip(df["event_id"], df["updated_at"]))
+    stats["total_s"] = time.perf_counter() - started
+    return stats
+
+def run_daemon(interval: float = None, max_interval: float = None, max_cycles: int = None, url: str = None):
+    """
+    Long-running ingest loop for sub-minute freshness.
+
+    Sleeps `interval` seconds after a cycle that loaded something; each cycle
+    where the feed was unchanged multiplies the delay by QW_POLL_BACKOFF up to
+    `max_interval`. Errors are logged and backed off the same way.
+    """
+    interval = interval or POLL_INTERVAL
+    max_interval = max_interval or POLL_MAX_INTERVAL
+    http = requests.Session()
+    cache = DimCache()
+    seen, validators = {}, None
+    delay, cycle = interval, 0
+
+    log.info("QuakeWatch daemon polling %s every %.0fs (max %.0fs)", url or USGS_FEED_HOURLY, interval, max_interval)
+    while max_cycles is None or cycle < max_cycles:
+        cycle += 1
+        try:
+            stats = run_cycle(http, cache, seen, validators, url)
+            validators = stats["validators"]
+            delay = interval if stats["changed"] else min(delay * POLL_BACKOFF, max_interval)
+            log.info(
+                "cycle %d: fetched=%d loaded=%d fetch=%.3fs total=%.3fs lag=%s next=%.1fs",
+                cycle, stats["fetched"], stats["loaded"], stats["fetch_s"], stats["total_s"],
+                f"{stats['lag_s']:.1f}s" if "lag_s" in stats else "-", delay,
+            )
+        except Exception as e:
+            delay = min(delay * POLL_BACKOFF, max_interval)
+            log.error("cycle %d failed: %s (retrying in %.1fs)", cycle, e, delay)
+            notify(f"❌ QuakeWatch daemon cycle failed: {e}")
+        if max_cycles is None or cycle < max_cycles:
+            time.sleep(delay)
 
 if __name__ == "__main__":
-    run_pipeline()
+    parser = argparse.ArgumentParser(description="QuakeWatch ETL")
+    parser.add_argument("--daemon", action="store_true", help="poll the hourly feed continuously")
+    parser.add_argument("--interval", type=float, default=None, help="base poll interval in seconds")
+    parser.add_argument("--replay", action="store_true", help="reload archived payloads instead of fetching")
+    parser.add_argument("--since", default=None, help="with --replay: ISO start of the fetch window (UTC)")
+    parser.add_argument("--until", default=None, help="with --replay: ISO end of the fetch window (UTC)")
+    args = parser.parse_args()
+
+    if auto_migrate_enabled():
+        init_db()
+    if args.daemon:
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+        run_daemon(interval=args.interval)
+    elif args.replay:
+        from etl.replay import replay_archive, parse_utc
+
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+        replay_archive(since=args.since and parse_utc(args.since), until=args.until and parse_utc(args.until))
+    else:
+        _build_flow()["run_pipeline"]()
@@ -1,13 +1,57 @@
 # etl/load.py
 
+import io
+import logging
+import os
+from datetime import timezone
+
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from app.db import engine, Base
+from sqlalchemy import select, text
+from app.db import engine
 from app.models import FactEvent, DimPlace, DimMagType
+from app.migrate import migrate
+
+# auto: COPY + set-based merge on PostgreSQL, raw executemany on SQLite, batched upserts elsewhere
+LOAD_MODE = os.getenv("QW_LOAD_MODE", "auto")              # auto | copy | sqlite | batch | row
+LOAD_BATCH_SIZE = int(os.getenv("QW_LOAD_BATCH_SIZE", "5000"))
+COPY_CHUNK_ROWS = int(os.getenv("QW_COPY_CHUNK_ROWS", "200000"))
+
+# Upserts never replace a stored event with an older version of it, so loads
+# (and archive replays) that arrive out of order can't roll an event back
+NEWER_OR_SAME = "fact_event.updated_at IS NULL OR excluded.updated_at >= fact_event.updated_at"
+
+FACT_COLUMNS = [
+    "event_id", "time_utc", "updated_at", "latitude", "longitude", "depth_km",
+    "magnitude", "mag_type_id", "place_id", "tsunami", "source",
+]
+STAGING_COLUMNS = [
+    "event_id", "time_utc", "updated_at", "latitude", "longitude", "depth_km",
+    "magnitude", "mag_type", "raw_place", "region", "country", "tsunami", "source",
+]
 
 def init_db():
-    """Create tables if they don’t exist."""
-    Base.metadata.create_all(engine)
+    """Create tables if they don’t exist (no-op once the schema is current)."""
+    migrate(engine)
+
+class DimCache:
+    """
+    In-memory map of dimension natural keys to surrogate ids.
+
+    Long-running loaders (see `etl.flow.run_daemon`) keep one instance across
+    iterations so known mag types and places don't cost a SELECT per row.
+    Entries are only added after the surrounding transaction commits.
+    """
+
+    def __init__(self):
+        self.mag_types = {}  # mag_type  -> mag_type_id
+        self.places = {}     # raw_place -> place_id
+
+    def __len__(self):
+        return len(self.mag_types) + len(self.places)
+
+    def clear(self):
+        self.mag_types.clear()
+        self.places.clear()
 
 def _get_or_create(session: Session, model, defaults=None, **kwargs):
     """Find or create a record in a dimension table."""
@@ -19,16 +63,32 @@ def _get_or_create(session: Session, model, defaults=None, **kwargs):
     session.flush()  # ensures instance gets an ID
     return instance
 
-def upsert_events(df):
+def _cached_id(known: dict, staged: dict, key, create):
+    """Resolve a dimension id through the cache, falling back to the DB."""
+    if key in known:
+        return known[key]
+    if key not in staged:
+        staged[key] = create()
+    return staged[key]
+
+def upsert_events(df, cache: DimCache = None):
     """Upsert event records from a DataFrame into the database."""
+    cache = cache if cache is not None else DimCache()
+    staged_mags, staged_places = {}, {}
     with Session(engine) as session:
         for row in df.to_dict(orient="records"):
-            mag = _get_or_create(session, DimMagType, mag_type=row["mag_type"]) if row["mag_type"] else None
-            place = _get_or_create(
-                session,
-                DimPlace,
-                raw_place=row["raw_place"],
-                defaults={"region": row["region"], "country": row["country"]}
+            mag_type_id = _cached_id(
+                cache.mag_types, staged_mags, row["mag_type"],
+                lambda: _get_or_create(session, DimMagType, mag_type=row["mag_type"]).mag_type_id,
+            ) if row["mag_type"] else None
+            place_id = _cached_id(
+                cache.places, staged_places, row["raw_place"],
+                lambda: _get_or_create(
+                    session,
+                    DimPlace,
+                    raw_place=row["raw_place"],
+                    defaults={"region": row["region"], "country": row["country"]}
+                ).place_id,
             ) if row["raw_place"] else None
 
             existing = session.get(FactEvent, row["event_id"])
@@ -40,12 +100,14 @@ def upsert_events(df):
                 "longitude": row["longitude"],
                 "depth_km": row["depth_km"],
                 "magnitude": row["magnitude"],
-                "mag_type_id": getattr(mag, "mag_type_id", None),
-                "place_id": getattr(place, "place_id", None),
+                "mag_type_id": mag_type_id,
+                "place_id": place_id,
                 "tsunami": int(row["tsunami"]),
                 "source": row["source"],
             }
 
+            if existing and _is_older(payload["updated_at"], existing.updated_at):
+                continue
             if existing:
                 for key, value in payload.items():
                     setattr(existing, key, value)
@@ -53,3 +115,295 @@ def upsert_events(df):
                 session.add(FactEvent(**payload))
 
         session.commit()
+
+    cache.mag_types.update(staged_mags)
+    cache.places.update(staged_places)
+
+def _is_older(incoming, stored) -> bool:
+    if incoming is None or stored is None:
+        return False
+    # SQLite hands back naive datetimes; everything is stored as UTC
+    if stored.tzinfo is None and incoming.tzinfo is not None:
+        incoming = incoming.astimezone(timezone.utc).replace(tzinfo=None)
+    return incoming < stored
+
+def changed_events(df):
+    """Rows of `df` that are not in fact_event yet or whose updated_at differs from the stored one."""
+    import pandas as pd
+
+    if df.empty:
+        return df
+    stored = {}
+    with Session(engine) as session:
+        ids = list(df["event_id"])
+        for start in range(0, len(ids), LOAD_BATCH_SIZE):
+            chunk = ids[start:start + LOAD_BATCH_SIZE]
+            stored.update((ev_id, updated) for ev_id, updated in session.execute(
+                select(FactEvent.event_id, FactEvent.updated_at).where(FactEvent.event_id.in_(chunk))
+            ))
+    if not stored:
+        return df
+    # SQLite hands back naive datetimes; everything is stored as UTC
+    previous = pd.to_datetime(df["event_id"].map(stored), utc=True)
+    return df[previous.isna() | (previous != df["updated_at"])]
+
+def _records(df) -> list:
+    """DataFrame rows as dicts with NaN/NaT mapped to None and timestamps as datetimes."""
+    out = df[STAGING_COLUMNS].astype(object).where(df[STAGING_COLUMNS].notna(), None)
+    for col in ("time_utc", "updated_at"):
+        out[col] = [v.to_pydatetime() if v is not None else None for v in out[col]]
+    return out.to_dict(orient="records")
+
+def _dialect_insert(bind):
+    """INSERT construct supporting ON CONFLICT for this backend, or None."""
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+def _resolve_dims(session: Session, insert, model, key: str, id_col: str, rows: dict, known: dict) -> dict:
+    """Insert missing dimension members in one statement and return {key: id} for `rows`."""
+    missing = [k for k in rows if k not in known]
+    resolved = {}
+    for start in range(0, len(missing), LOAD_BATCH_SIZE):
+        chunk = missing[start:start + LOAD_BATCH_SIZE]
+        # Core executemany (not the ORM bulk path) so the driver batches the VALUES
+        session.connection().execute(
+            insert(model.__table__).on_conflict_do_nothing(index_elements=[key]),
+            [rows[k] for k in chunk],
+        )
+        key_col, id_attr = getattr(model, key), getattr(model, id_col)
+        resolved.update((k, v) for k, v in session.execute(select(key_col, id_attr).where(key_col.in_(chunk))))
+    return resolved
+
+def batch_upsert_events(df, cache: DimCache = None, batch_size: int = None) -> int:
+    """
+    Upsert events with a handful of set-based statements per batch.
+
+    Dimensions are resolved once per distinct value; facts go through one
+    executemany INSERT ... ON CONFLICT (event_id) DO UPDATE per batch.
+    Everything commits in a single transaction.
+    """
+    insert = _dialect_insert(engine)
+    if insert is None:
+        upsert_events(df, cache)
+        return len(df)
+    cache = cache if cache is not None else DimCache()
+    batch_size = batch_size or LOAD_BATCH_SIZE
+    records = _records(df)
+
+    mag_rows = {r["mag_type"]: {"mag_type": r["mag_type"]} for r in records if r["mag_type"]}
+    place_rows = {
+        r["raw_place"]: {"raw_place": r["raw_place"], "region": r["region"], "country": r["country"]}
+        for r in records if r["raw_place"]
+    }
+
+    stmt = insert(FactEvent.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["event_id"],
+        set_={c: stmt.excluded[c] for c in FACT_COLUMNS if c != "event_id"},
+        where=text(NEWER_OR_SAME),
+    )
+    with Session(engine) as session:
+        new_mags = _resolve_dims(session, insert, DimMagType, "mag_type", "mag_type_id", mag_rows, cache.mag_types)
+        new_places = _resolve_dims(session, insert, DimPlace, "raw_place", "place_id", place_rows, cache.places)
+        mag_ids = {**cache.mag_types, **new_mags}
+        place_ids = {**cache.places, **new_places}
+
+        # last occurrence wins when a batch repeats an event_id (ON CONFLICT can't touch a row twice)
+        facts = {}
+        for r in records:
+            facts[r["event_id"]] = {
+                **{c: r[c] for c in FACT_COLUMNS if c in r},
+                "mag_type_id": mag_ids.get(r["mag_type"]),
+                "place_id": place_ids.get(r["raw_place"]),
+                "tsunami": int(r["tsunami"] or 0),
+            }
+        facts = list(facts.values())
+        conn = session.connection()
+        for start in range(0, len(facts), batch_size):
+            conn.execute(stmt, facts[start:start + batch_size])
+        session.commit()
+
+    cache.mag_types.update(new_mags)
+    cache.places.update(new_places)
+    return len(facts)
+
+# --- SQLite executemany path ---
+# Same statements as batch_upsert_events, but fact rows are built column-wise
+# as tuples (timestamps pre-formatted the way SQLAlchemy stores them on SQLite)
+# and handed straight to sqlite3's executemany, skipping per-row dict building
+# and bind processing, which dominate the batched path on SQLite.
+SQLITE_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+_SQLITE_UPSERT = (
+    f"INSERT INTO fact_event ({', '.join(FACT_COLUMNS)}) VALUES ({', '.join('?' for _ in FACT_COLUMNS)}) "
+    f"ON CONFLICT (event_id) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in FACT_COLUMNS if c != "event_id")
+    + f" WHERE {NEWER_OR_SAME}"
+)
+
+def _nullable(series) -> list:
+    return series.astype(object).where(series.notna(), None).tolist()
+
+def _sqlite_datetimes(series) -> list:
+    import pandas as pd
+
+    utc = pd.to_datetime(series, utc=True).dt.tz_localize(None)
+    return _nullable(utc.dt.strftime(SQLITE_DATETIME_FORMAT))
+
+def sqlite_load_events(df, cache: DimCache = None, batch_size: int = None) -> int:
+    """Upsert events into SQLite with one executemany per batch; returns distinct events loaded."""
+    from sqlalchemy.dialects.sqlite import insert
+
+    cache = cache if cache is not None else DimCache()
+    batch_size = batch_size or LOAD_BATCH_SIZE
+    # last occurrence wins when a batch repeats an event_id, as in batch_upsert_events
+    df = df.drop_duplicates("event_id", keep="last")
+
+    mag_rows = {m: {"mag_type": m} for m in df["mag_type"].dropna().unique()}
+    places = df[["raw_place", "region", "country"]].dropna(subset=["raw_place"]).drop_duplicates("raw_place", keep="last")
+    place_rows = {r["raw_place"]: r for r in _nullable_records(places)}
+
+    with Session(engine) as session:
+        new_mags = _resolve_dims(session, insert, DimMagType, "mag_type", "mag_type_id", mag_rows, cache.mag_types)
+        new_places = _resolve_dims(session, insert, DimPlace, "raw_place", "place_id", place_rows, cache.places)
+        mag_ids = {**cache.mag_types, **new_mags}
+        place_ids = {**cache.places, **new_places}
+
+        columns = {
+            "event_id": df["event_id"].tolist(),
+            "time_utc": _sqlite_datetimes(df["time_utc"]),
+            "updated_at": _sqlite_datetimes(df["updated_at"]),
+            "latitude": _nullable(df["latitude"]),
+            "longitude": _nullable(df["longitude"]),
+            "depth_km": _nullable(df["depth_km"]),
+            "magnitude": _nullable(df["magnitude"]),
+            "mag_type_id": _nullable(df["mag_type"].map(mag_ids).astype("Int64")),
+            "place_id": _nullable(df["raw_place"].map(place_ids).astype("Int64")),
+            "tsunami": df["tsunami"].fillna(0).astype(int).tolist(),
+            "source": _nullable(df["source"]),
+        }
+        rows = list(zip(*(columns[c] for c in FACT_COLUMNS)))
+        conn = session.connection()
+        for start in range(0, len(rows), batch_size):
+            conn.exec_driver_sql(_SQLITE_UPSERT, rows[start:start + batch_size])
+        session.commit()
+
+    cache.mag_types.update(new_mags)
+    cache.places.update(new_places)
+    return len(rows)
+
+def _nullable_records(df) -> list:
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
+
+# --- PostgreSQL COPY path ---
+_STAGING_DDL = """
+CREATE UNLOGGED TABLE IF NOT EXISTS stg_event (
+    event_id    text,
+    time_utc    timestamptz,
+    updated_at  timestamptz,
+    latitude    double precision,
+    longitude   double precision,
+    depth_km    double precision,
+    magnitude   double precision,
+    mag_type    text,
+    raw_place   text,
+    region      text,
+    country     text,
+    tsunami     integer,
+    source      text
+)
+"""
+
+_MERGE_SQL = [
+    """
+    INSERT INTO dim_mag_type (mag_type)
+    SELECT DISTINCT mag_type FROM stg_event WHERE mag_type IS NOT NULL
+    ON CONFLICT (mag_type) DO NOTHING
+    """,
+    """
+    INSERT INTO dim_place (raw_place, region, country)
+    SELECT DISTINCT ON (raw_place) raw_place, region, country
+    FROM stg_event WHERE raw_place IS NOT NULL
+    ORDER BY raw_place
+    ON CONFLICT (raw_place) DO NOTHING
+    """,
+    """
+    INSERT INTO fact_event (event_id, time_utc, updated_at, latitude, longitude, depth_km,
+                            magnitude, mag_type_id, place_id, tsunami, source)
+    SELECT DISTINCT ON (s.event_id)
+           s.event_id, s.time_utc, s.updated_at, s.latitude, s.longitude, s.depth_km,
+           s.magnitude, m.mag_type_id, p.place_id, s.tsunami, s.source
+    FROM stg_event s
+    LEFT JOIN dim_mag_type m ON m.mag_type = s.mag_type
+    LEFT JOIN dim_place p    ON p.raw_place = s.raw_place
+    ORDER BY s.event_id, s.updated_at DESC
+    ON CONFLICT (event_id) DO UPDATE SET
+        time_utc = EXCLUDED.time_utc, updated_at = EXCLUDED.updated_at,
+        latitude = EXCLUDED.latitude, longitude = EXCLUDED.longitude,
+        depth_km = EXCLUDED.depth_km, magnitude = EXCLUDED.magnitude,
+        mag_type_id = EXCLUDED.mag_type_id, place_id = EXCLUDED.place_id,
+        tsunami = EXCLUDED.tsunami, source = EXCLUDED.source
+    WHERE """ + NEWER_OR_SAME,
+]
+
+def _csv_chunks(df, chunk_rows: int):
+    """Yield in-memory CSV buffers of at most `chunk_rows` staging rows (NULL as \\N)."""
+    for start in range(0, len(df), chunk_rows):
+        buf = io.StringIO()
+        df.iloc[start:start + chunk_rows][STAGING_COLUMNS].to_csv(
+            buf, index=False, header=False, na_rep="\\N",
+        )
+        buf.seek(0)
+        yield buf
+
+def copy_load_events(df, chunk_rows: int = None) -> int:
+    """
+    Bulk-load via COPY FROM STDIN into the unlogged stg_event table, then merge
+    into the dimensions and fact_event with set-based SQL, all in one transaction.
+
+    TRUNCATE takes an exclusive lock on stg_event until commit, so concurrent
+    loaders queue behind each other instead of mixing staging rows.
+    """
+    chunk_rows = chunk_rows or COPY_CHUNK_ROWS
+    copy_sql = f"COPY stg_event ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+    with engine.begin() as conn:
+        conn.execute(text(_STAGING_DDL))
+        conn.execute(text("TRUNCATE stg_event"))
+        raw = conn.connection.driver_connection
+        with raw.cursor() as cur:
+            for buf in _csv_chunks(df, chunk_rows):
+                cur.copy_expert(copy_sql, buf)
+        for sql in _MERGE_SQL:
+            conn.execute(text(sql))
+        merged = conn.execute(text("SELECT count(DISTINCT event_id) FROM stg_event")).scalar()
+    return merged
+
+def load_events(df, cache: DimCache = None, mode: str = None) -> int:
+    """
+    Load a validated DataFrame using the configured strategy (QW_LOAD_MODE).
+
+    `copy` needs PostgreSQL + psycopg2 and `sqlite` needs SQLite; both fall
+    back to `batch` elsewhere. `row` is the original per-row ORM upsert.
+    """
+    if df.empty:
+        return 0
+    mode = mode or LOAD_MODE
+    if mode in ("auto", "copy"):
+        if engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2":
+            return copy_load_events(df)
+        if mode == "copy":
+            logging.info(f"COPY loader needs PostgreSQL/psycopg2, using batched upserts on {engine.dialect.name}")
+        mode = "sqlite" if mode == "auto" else "batch"
+    if mode == "sqlite":
+        if engine.dialect.name == "sqlite":
+            return sqlite_load_events(df, cache)
+        mode = "batch"
+    if mode == "batch":
+        return batch_upsert_events(df, cache)
+    upsert_events(df, cache)
+    return len(df)
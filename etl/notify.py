@@ -0,0 +1,74 @@
+# etl/notify.py
+
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+
+import requests
+
+# Optional Slack alerting for pipeline status messages
+SLACK_WEBHOOK = os.getenv("PREFECT_SLACK_WEBHOOK_URL")
+
+class Notifier(ABC):
+    """Delivers a text message (plus optional structured payload) somewhere; raises if it can't."""
+
+    @abstractmethod
+    def send(self, text: str, payload: dict = None):
+        ...
+
+class LogNotifier(Notifier):
+    """Writes alerts to the log; the default when nothing else is configured."""
+
+    def send(self, text: str, payload: dict = None):
+        logging.info(text)
+
+class SlackNotifier(Notifier):
+    """Posts to a Slack incoming webhook."""
+
+    def __init__(self, target: str = None):
+        self.webhook = target or SLACK_WEBHOOK
+
+    def send(self, text: str, payload: dict = None):
+        if not self.webhook:
+            raise RuntimeError("No Slack webhook configured (subscription target or PREFECT_SLACK_WEBHOOK_URL)")
+        response = requests.post(
+            self.webhook,
+            headers={"Content-Type": "application/json"},
+            data=json.dumps({"text": text}),
+            timeout=10
+        )
+        response.raise_for_status()
+
+class WebhookNotifier(Notifier):
+    """POSTs {"text": ..., **payload} as JSON to an arbitrary URL."""
+
+    def __init__(self, target: str):
+        self.url = target
+
+    def send(self, text: str, payload: dict = None):
+        response = requests.post(self.url, json={"text": text, **(payload or {})}, timeout=10)
+        response.raise_for_status()
+
+# channel name -> Notifier class; register new channels here
+NOTIFIERS = {
+    "log": LogNotifier,
+    "slack": SlackNotifier,
+    "webhook": WebhookNotifier,
+}
+
+def get_notifier(channel: str, target: str = None) -> Notifier:
+    """Build the notifier for a subscription's channel/target."""
+    cls = NOTIFIERS.get(channel or "log")
+    if cls is None:
+        raise ValueError(f"Unknown notifier channel: {channel!r}")
+    return cls() if cls is LogNotifier else cls(target)
+
+def notify(msg: str):
+    """Send message to Slack if webhook is configured."""
+    if not SLACK_WEBHOOK:
+        return
+    try:
+        SlackNotifier().send(msg)
+    except Exception as e:
+        print(f"Slack notification failed: {e}")
@@ -0,0 +1,131 @@
+# etl/parallel.py
+
+import json
+import logging
+import multiprocessing
+import os
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from etl.transform import features_to_df, validate_df, get_schema
+
+# Parallel transform for backfills: forked workers inherit the parsed feature
+# list and are sent only (start, stop) ranges; results come back as Arrow IPC
+# buffers, so neither direction pickles Python dicts. Off by default (1 worker):
+# set QW_TRANSFORM_WORKERS to a count, or 0 for one per CPU, on multi-core hosts.
+TRANSFORM_WORKERS = int(os.getenv("QW_TRANSFORM_WORKERS", "1")) or os.cpu_count() or 1
+TRANSFORM_SHARD_SIZE = int(os.getenv("QW_TRANSFORM_SHARD_SIZE", "20000"))
+
+try:
+    import pyarrow as pa
+except ImportError:  # optional: fall back to pickled DataFrames
+    pa = None
+
+# set in the parent just before the pool forks; workers read it copy-on-write
+_SHARED_FEATURES = None
+
+def shard_ranges(total: int, shard_size: int) -> list:
+    """Consecutive (start, stop) ranges covering `total` features."""
+    return [(start, min(start + shard_size, total)) for start in range(0, total, shard_size)]
+
+def _encode(df: pd.DataFrame) -> bytes:
+    if pa is None:
+        return pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+def _decode_concat(buffers: list) -> pd.DataFrame:
+    if pa is None:
+        return pd.concat([pickle.loads(b) for b in buffers], ignore_index=True)
+    # concat_tables only stitches chunk references together; the single
+    # to_pandas() at the end is the only copy of the column data
+    tables = [pa.ipc.open_stream(b).read_all() for b in buffers]
+    return pa.concat_tables(tables, promote_options="default").to_pandas()
+
+def transform_shard(bounds: tuple) -> bytes:
+    """Worker entry point: a (start, stop) range of the inherited features in, validated Arrow (or pickled) frame out."""
+    start, stop = bounds
+    return _encode(validate_df(features_to_df(_SHARED_FEATURES[start:stop])))
+
+def latest_features(payloads) -> tuple:
+    """
+    Merge feature lists given in fetch order, keeping the newest `updated` per
+    event id (the later fetch wins ties). Returns (features, total seen).
+    """
+    latest, total = {}, 0
+    for features in payloads:
+        total += len(features)
+        for feat in features:
+            current = latest.get(feat.get("id"))
+            if current is None or (feat["properties"].get("updated") or 0) >= (current["properties"].get("updated") or 0):
+                latest[feat.get("id")] = feat
+    return list(latest.values()), total
+
+def transform_archived(paths: list) -> tuple:
+    """
+    Worker entry point for replay: a batch of archived .json.zst payloads in,
+    (encoded frame of the newest version of each event, features read) out.
+
+    Consecutive feed snapshots overlap almost entirely, so collapsing versions
+    before features_to_df means each event is transformed once per batch.
+    """
+    import zstandard
+
+    decompressor = zstandard.ZstdDecompressor()
+
+    def read(path):
+        with open(path, "rb") as fh:
+            return json.loads(decompressor.decompress(fh.read()))["features"]
+
+    features, total = latest_features(read(p) for p in paths)
+    return _encode(validate_df(features_to_df(features))), total
+
+def map_ordered(pool, fn, items, window: int):
+    """
+    pool.map that keeps at most `window` results in flight.
+
+    Results come back in input order; unlike Executor.map it doesn't submit
+    every item up front, so a long replay never buffers all of its output.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def decode_frame(buffer: bytes) -> pd.DataFrame:
+    return _decode_concat([buffer])
+
+def transform_parallel(features: list, workers: int = None, shard_size: int = None) -> pd.DataFrame:
+    """
+    Transform and validate `features` across a process pool.
+
+    Falls back to the in-process path when everything fits in one shard, only
+    one worker is configured, or the platform can't fork (workers must inherit
+    the feature list). Row order matches the input.
+    """
+    global _SHARED_FEATURES
+    workers = workers or TRANSFORM_WORKERS
+    shard_size = shard_size or TRANSFORM_SHARD_SIZE
+    if workers <= 1 or len(features) <= shard_size or "fork" not in multiprocessing.get_all_start_methods():
+        return validate_df(features_to_df(features))
+
+    shards = shard_ranges(len(features), shard_size)
+    workers = min(workers, len(shards))
+    logging.info(f"Transforming {len(features)} features in {len(shards)} shards on {workers} workers")
+    get_schema()  # import pandera once here so forked workers inherit it
+    _SHARED_FEATURES = features
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as pool:
+            buffers = list(pool.map(transform_shard, shards))
+    finally:
+        _SHARED_FEATURES = None
+    return _decode_concat(buffers)
@@ -0,0 +1,200 @@
+# etl/places.py
+
+import os
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+# Normalizes USGS place strings ("10 km NNE of Anza, CA", "Fiji region",
+# "south of the Kermadec Islands") into (region, country):
+#   - US states/territories (full name or postal code) -> (state, "United States")
+#   - other places -> (locality without the distance prefix, canonical country)
+#   - offshore/oceanic regions -> (region, owning country or None)
+# Results are memoized per raw string; USGS repeats the same places constantly.
+PLACE_CACHE_SIZE = int(os.getenv("QW_PLACE_CACHE_SIZE", "65536"))
+
+UNITED_STATES = "United States"
+
+US_STATES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas", "CA": "California",
+    "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware", "FL": "Florida", "GA": "Georgia",
+    "HI": "Hawaii", "ID": "Idaho", "IL": "Illinois", "IN": "Indiana", "IA": "Iowa",
+    "KS": "Kansas", "KY": "Kentucky", "LA": "Louisiana", "ME": "Maine", "MD": "Maryland",
+    "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota", "MS": "Mississippi", "MO": "Missouri",
+    "MT": "Montana", "NE": "Nebraska", "NV": "Nevada", "NH": "New Hampshire", "NJ": "New Jersey",
+    "NM": "New Mexico", "NY": "New York", "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio",
+    "OK": "Oklahoma", "OR": "Oregon", "PA": "Pennsylvania", "RI": "Rhode Island", "SC": "South Carolina",
+    "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas", "UT": "Utah", "VT": "Vermont",
+    "VA": "Virginia", "WA": "Washington", "WV": "West Virginia", "WI": "Wisconsin", "WY": "Wyoming",
+    "DC": "District of Columbia", "PR": "Puerto Rico", "GU": "Guam", "VI": "U.S. Virgin Islands",
+    "AS": "American Samoa", "MP": "Northern Mariana Islands",
+}
+
+# Canonical country names: every alias and offshore owner below resolves to one
+# of these. US territories stay in US_STATES and map to the United States.
+COUNTRIES = [
+    "Afghanistan", "Albania", "Algeria", "Andorra", "Angola", "Antigua and Barbuda", "Argentina", "Armenia",
+    "Australia", "Austria", "Azerbaijan", "Bahamas", "Bahrain", "Bangladesh", "Barbados", "Belarus", "Belgium",
+    "Belize", "Benin", "Bhutan", "Bolivia", "Bosnia and Herzegovina", "Botswana", "Brazil", "Brunei", "Bulgaria",
+    "Burkina Faso", "Burundi", "Cabo Verde", "Cambodia", "Cameroon", "Canada", "Central African Republic", "Chad",
+    "Chile", "China", "Colombia", "Comoros", "Congo", "Costa Rica", "Croatia", "Cuba", "Cyprus", "Czechia",
+    "DR Congo", "Denmark", "Djibouti", "Dominica", "Dominican Republic", "Ecuador", "Egypt", "El Salvador",
+    "Equatorial Guinea", "Eritrea", "Estonia", "Eswatini", "Ethiopia", "Fiji", "Finland", "France", "Gabon",
+    "Gambia", "Georgia", "Germany", "Ghana", "Greece", "Grenada", "Guatemala", "Guinea", "Guinea-Bissau", "Guyana",
+    "Haiti", "Honduras", "Hungary", "Iceland", "India", "Indonesia", "Iran", "Iraq", "Ireland", "Israel", "Italy",
+    "Ivory Coast", "Jamaica", "Japan", "Jordan", "Kazakhstan", "Kenya", "Kiribati", "Kosovo", "Kuwait",
+    "Kyrgyzstan", "Laos", "Latvia", "Lebanon", "Lesotho", "Liberia", "Libya", "Liechtenstein", "Lithuania",
+    "Luxembourg", "Madagascar", "Malawi", "Malaysia", "Maldives", "Mali", "Malta", "Marshall Islands",
+    "Mauritania", "Mauritius", "Mexico", "Micronesia", "Moldova", "Monaco", "Mongolia", "Montenegro", "Morocco",
+    "Mozambique", "Myanmar", "Namibia", "Nauru", "Nepal", "Netherlands", "New Zealand", "Nicaragua", "Niger",
+    "Nigeria", "North Korea", "North Macedonia", "Norway", "Oman", "Pakistan", "Palau", "Palestine", "Panama",
+    "Papua New Guinea", "Paraguay", "Peru", "Philippines", "Poland", "Portugal", "Qatar", "Romania", "Russia",
+    "Rwanda", "Saint Kitts and Nevis", "Saint Lucia", "Saint Vincent and the Grenadines", "Samoa", "San Marino",
+    "Sao Tome and Principe", "Saudi Arabia", "Senegal", "Serbia", "Seychelles", "Sierra Leone", "Singapore",
+    "Slovakia", "Slovenia", "Solomon Islands", "Somalia", "South Africa", "South Korea", "South Sudan", "Spain",
+    "Sri Lanka", "Sudan", "Suriname", "Sweden", "Switzerland", "Syria", "Taiwan", "Tajikistan", "Tanzania",
+    "Thailand", "Timor-Leste", "Togo", "Tonga", "Trinidad and Tobago", "Tunisia", "Turkey", "Turkmenistan",
+    "Tuvalu", "Uganda", "Ukraine", "United Arab Emirates", "United Kingdom", UNITED_STATES, "Uruguay",
+    "Uzbekistan", "Vanuatu", "Vatican City", "Venezuela", "Vietnam", "Yemen", "Zambia", "Zimbabwe",
+    # territories USGS reports as the country component
+    "Anguilla", "Aruba", "Bermuda", "Bouvet Island", "British Virgin Islands", "Cayman Islands", "Cook Islands",
+    "Curacao", "Falkland Islands", "Faroe Islands", "French Polynesia", "Greenland", "Guadeloupe",
+    "Heard Island and McDonald Islands", "Martinique", "Montserrat", "New Caledonia", "Niue", "Norfolk Island",
+    "Pitcairn Islands", "Reunion", "Saint Helena", "Saint Pierre and Miquelon", "Svalbard and Jan Mayen",
+    "South Georgia and the South Sandwich Islands", "Tokelau", "Turks and Caicos Islands", "Wallis and Futuna",
+    "Western Sahara",
+]
+
+# lowercase alias -> canonical country name
+COUNTRY_ALIASES = {
+    "us": UNITED_STATES, "usa": UNITED_STATES, "u.s.": UNITED_STATES, "united states of america": UNITED_STATES,
+    "mx": "Mexico", "méxico": "Mexico",
+    "russian federation": "Russia",
+    "burma": "Myanmar", "burma (myanmar)": "Myanmar",
+    "türkiye": "Turkey", "turkiye": "Turkey",
+    "republic of korea": "South Korea", "korea, republic of": "South Korea",
+    "democratic republic of the congo": "DR Congo", "congo (kinshasa)": "DR Congo",
+    "viet nam": "Vietnam",
+    "iran, islamic republic of": "Iran",
+    "uk": "United Kingdom", "great britain": "United Kingdom",
+    "the netherlands": "Netherlands",
+    "timor leste": "Timor-Leste", "east timor": "Timor-Leste",
+    "czech republic": "Czechia", "cote d'ivoire": "Ivory Coast", "côte d'ivoire": "Ivory Coast",
+    "swaziland": "Eswatini", "macedonia": "North Macedonia", "cape verde": "Cabo Verde",
+    "lao people's democratic republic": "Laos", "syrian arab republic": "Syria",
+    "republic of the congo": "Congo", "congo (brazzaville)": "Congo",
+    "federated states of micronesia": "Micronesia", "réunion": "Reunion", "curaçao": "Curacao",
+}
+
+# lowercase offshore / oceanic region -> owning country (None for open ocean)
+OFFSHORE_REGIONS = {
+    "fiji": "Fiji", "fiji islands": "Fiji",
+    "kermadec islands": "New Zealand", "auckland islands": "New Zealand",
+    "tonga": "Tonga", "vanuatu": "Vanuatu", "samoa islands": "Samoa",
+    "south sandwich islands": "South Georgia and the South Sandwich Islands",
+    "south georgia island": "South Georgia and the South Sandwich Islands",
+    "mariana islands": "Northern Mariana Islands",
+    "aleutian islands": UNITED_STATES, "andreanof islands": UNITED_STATES, "rat islands": UNITED_STATES,
+    "fox islands": UNITED_STATES, "alaska peninsula": UNITED_STATES, "gulf of alaska": UNITED_STATES,
+    "gulf of california": "Mexico", "kuril islands": "Russia", "komandorskiye ostrova": "Russia",
+    "loyalty islands": "New Caledonia", "new britain": "Papua New Guinea", "bismarck sea": "Papua New Guinea",
+    "banda sea": "Indonesia", "molucca sea": "Indonesia", "ryukyu islands": "Japan", "bonin islands": "Japan",
+    "izu islands": "Japan", "honshu": "Japan", "hokkaido": "Japan", "kyushu": "Japan",
+    "mid-atlantic ridge": None, "east pacific rise": None, "reykjanes ridge": None,
+    "central east pacific rise": None, "pacific-antarctic ridge": None, "southeast indian ridge": None,
+    "southwest indian ridge": None, "carlsberg ridge": None, "macquarie island": "Australia",
+    "west chile rise": None, "chile rise": None, "galapagos triple junction": None,
+    "north atlantic ocean": None, "south atlantic ocean": None, "north pacific ocean": None,
+    "south pacific ocean": None, "indian ocean": None, "arctic ocean": None, "southern ocean": None,
+    "easter island": "Chile", "south shetland islands": None, "prince edward islands": "South Africa",
+    "balleny islands": None, "bouvet island": "Bouvet Island",
+}
+
+_COUNTRY_BY_NAME = {name.lower(): name for name in COUNTRIES}
+_US_STATE_NAMES = set(US_STATES.values())
+# State names that are also countries ("Georgia") mean the country when spelled
+# out; the US state is only recognised by its postal code ("Atlanta, GA")
+_US_BY_NAME = {name.lower(): name for name in _US_STATE_NAMES if name.lower() not in _COUNTRY_BY_NAME}
+
+# Qualifiers USGS puts in front of a name: "10 km NNE of ", "near the east coast
+# of ", "off the coast of ", "south of the ", "northern ", "central ", possibly
+# stacked ("near the coast of central Chile"). They are lowercase; capitalised
+# words ("South Sandwich Islands", "North Atlantic Ocean") belong to the name.
+_PREFIX = re.compile(
+    r"^(?:\d+(?:\.\d+)?\s*km\s+[NSEW]{1,3}\s+of\s+"
+    r"|(?:near|off)\s+(?:the\s+)?(?:(?:north|south|east|west)(?:ern)?\s+)?(?:coast\s+of\s+)?(?:the\s+)?"
+    r"|(?:north|south|east|west|northeast|northwest|southeast|southwest|central)(?:ern)?\s+(?:of\s+)?(?:the\s+)?)+"
+)
+_REGION_SUFFIX = re.compile(r"\s+region$", re.IGNORECASE)
+
+def _strip(text: str) -> str:
+    return _REGION_SUFFIX.sub("", _PREFIX.sub("", text.strip())).strip()
+
+def normalize_country(name: str):
+    """
+    (region, country) for a name in the place tables, or None if it is unknown.
+
+    Region is the US state, the canonical country, or the offshore region name.
+    """
+    key = _REGION_SUFFIX.sub("", name.strip()).strip() if name else ""
+    if not key:
+        return None
+    if len(key) == 2 and key.upper() in US_STATES:
+        return US_STATES[key.upper()], UNITED_STATES
+    lower = key.lower()
+    if lower in _US_BY_NAME:
+        return _US_BY_NAME[lower], UNITED_STATES
+    if lower in _COUNTRY_BY_NAME:
+        return _COUNTRY_BY_NAME[lower], _COUNTRY_BY_NAME[lower]
+    if lower in COUNTRY_ALIASES:
+        return COUNTRY_ALIASES[lower], COUNTRY_ALIASES[lower]
+    if lower in OFFSHORE_REGIONS:
+        return key, OFFSHORE_REGIONS[lower]
+    return None
+
+def _known_place(text: str):
+    """normalize_country on the name as written, then without its leading qualifier."""
+    found = normalize_country(text)
+    if found is None:
+        stripped = _strip(text)
+        if stripped and stripped != text.strip():
+            found = normalize_country(stripped)
+    return found
+
+@lru_cache(maxsize=PLACE_CACHE_SIZE)
+def parse_place(raw: str):
+    """Parse one USGS place string into (region, country); memoized on the raw value."""
+    if not raw or not isinstance(raw, str):
+        return None, None
+    head, sep, tail = raw.rpartition(",")
+    if not sep:
+        # single component: offshore region, bare state/country, or unknown
+        found = _known_place(raw)
+        if found is None:
+            return _REGION_SUFFIX.sub("", raw.strip()), None   # unknown: region only, no invented country
+        return found
+
+    found = _known_place(tail)
+    if found is not None and found[1] == UNITED_STATES and found[0] in _US_STATE_NAMES:
+        return found
+    if found is not None:
+        country = found[1]
+    else:
+        # USGS puts the country last; keep an unlisted one as written, but never a qualifier remainder
+        country = tail.strip() if _strip(tail) == tail.strip() else None
+    # "Andreanof Islands, Aleutian Islands, Alaska" style: locality is the part before the country
+    locality = _strip(head.rpartition(",")[2]) or None
+    return locality, country
+
+def normalize_places(places: pd.Series) -> pd.DataFrame:
+    """Batch version of parse_place: parses each distinct string once."""
+    codes, uniques = pd.factorize(places, use_na_sentinel=True)
+    parsed = [parse_place(u) for u in uniques]
+    regions = pd.Series([p[0] for p in parsed] + [None], dtype=object)
+    countries = pd.Series([p[1] for p in parsed] + [None], dtype=object)
+    # sentinel -1 (missing place) indexes the trailing None
+    return pd.DataFrame({
+        "region": regions.to_numpy()[codes].tolist(),
+        "country": countries.to_numpy()[codes].tolist(),
+    }, index=places.index)
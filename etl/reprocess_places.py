@@ -0,0 +1,55 @@
+# etl/reprocess_places.py
+"""
+Re-derive dim_place.region / dim_place.country from raw_place with the current
+etl.places rules and write the changes back in bulk.
+
+    python -m etl.reprocess_places            # apply
+    python -m etl.reprocess_places --dry-run  # only count what would change
+"""
+import argparse
+import logging
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.db import engine
+from app.models import DimPlace
+from etl.places import parse_place
+
+def reprocess_places(bind=None, batch_size: int = 5000, dry_run: bool = False) -> int:
+    """Rewrite region/country for every dim_place row whose parse changed; returns rows updated."""
+    bind = bind or engine
+    changed = 0
+    with Session(bind) as session:
+        rows = session.execute(
+            select(DimPlace.place_id, DimPlace.raw_place, DimPlace.region, DimPlace.country)
+        ).all()
+        batch = []
+        for place_id, raw_place, region, country in rows:
+            new_region, new_country = parse_place(raw_place)
+            if (new_region, new_country) == (region, country):
+                continue
+            batch.append({"place_id": place_id, "region": new_region, "country": new_country})
+            if len(batch) >= batch_size:
+                changed += _flush(session, batch, dry_run)
+        changed += _flush(session, batch, dry_run)
+        if not dry_run:
+            session.commit()
+    logging.info(f"Reprocessed places: {changed} of {len(rows)} rows changed")
+    return changed
+
+def _flush(session: Session, batch: list, dry_run: bool) -> int:
+    """Bulk UPDATE ... WHERE place_id = :place_id (one executemany per batch)."""
+    n = len(batch)
+    if batch and not dry_run:
+        session.execute(update(DimPlace), batch)
+    batch.clear()
+    return n
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-normalize dim_place countries/regions")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    print(f"{reprocess_places(batch_size=args.batch_size, dry_run=args.dry_run)} places updated")
@@ -1,18 +1,10 @@
 # etl/transform.py
 
+from functools import lru_cache
 import pandas as pd
-import pandera as pa
-from pandera import Column, DataFrameSchema
 import logging
 
-def _split_place(raw: str):
-    """Split a USGS place string into region and country (best-effort)."""
-    if not raw or not isinstance(raw, str):
-        return None, None
-    parts = [p.strip() for p in raw.split(",")]
-    if len(parts) == 1:
-        return parts[0], None
-    return parts[-2], parts[-1]
+from etl.places import normalize_places
 
 def features_to_df(features: list) -> pd.DataFrame:
     """Convert GeoJSON features list into a structured DataFrame."""
@@ -21,44 +13,59 @@ def features_to_df(features: list) -> pd.DataFrame:
         props = f.get("properties", {})
         geom = f.get("geometry", {}) or {}
         coords = geom.get("coordinates", [None, None, None])
-        region, country = _split_place(props.get("place"))
 
         rows.append({
             "event_id": f.get("id"),
-            "time_utc": pd.to_datetime(props.get("time"), unit="ms", utc=True),
-            "updated_at": pd.to_datetime(props.get("updated"), unit="ms", utc=True),
+            "time_utc": props.get("time"),
+            "updated_at": props.get("updated"),
             "latitude": coords[1],
             "longitude": coords[0],
             "depth_km": coords[2],
             "magnitude": props.get("mag"),
             "mag_type": (props.get("magType") or "").upper() or None,
             "raw_place": props.get("place"),
-            "region": region,
-            "country": country,
+            "region": None,
+            "country": None,
             "tsunami": int(props.get("tsunami") or 0),
             "source": props.get("type") or "earthquake",
         })
-    return pd.DataFrame(rows)
+    df = pd.DataFrame(rows)
+    if not df.empty:
+        # one vectorized conversion per column instead of one per row
+        for col in ("time_utc", "updated_at"):
+            df[col] = pd.to_datetime(df[col], unit="ms", utc=True)
+        df[["region", "country"]] = normalize_places(df["raw_place"])
+    return df
 
-# Define schema using Pandera
-schema = DataFrameSchema({
-    "event_id": Column(str),
-    "time_utc": Column(pd.DatetimeTZDtype(tz="UTC")),
-    "updated_at": Column(pd.DatetimeTZDtype(tz="UTC")),
-    "latitude": Column(float, nullable=True),
-    "longitude": Column(float, nullable=True),
-    "depth_km": Column(float, nullable=True),
-    "magnitude": Column(float, nullable=True),
-    "mag_type": Column(object, nullable=True),
-    "raw_place": Column(object, nullable=True),
-    "region": Column(object, nullable=True),
-    "country": Column(object, nullable=True),
-    "tsunami": Column(int),
-    "source": Column(object),
-})
+# Define schema using Pandera (imported on first validation; it is slow to load)
+@lru_cache(maxsize=1)
+def get_schema():
+    from pandera import Column, DataFrameSchema
+    return DataFrameSchema({
+        "event_id": Column(str),
+        "time_utc": Column(pd.DatetimeTZDtype(tz="UTC")),
+        "updated_at": Column(pd.DatetimeTZDtype(tz="UTC")),
+        "latitude": Column(float, nullable=True),
+        "longitude": Column(float, nullable=True),
+        "depth_km": Column(float, nullable=True),
+        "magnitude": Column(float, nullable=True),
+        "mag_type": Column(object, nullable=True),
+        "raw_place": Column(object, nullable=True),
+        "region": Column(object, nullable=True),
+        "country": Column(object, nullable=True),
+        "tsunami": Column(int),
+        "source": Column(object),
+    })
+
+def __getattr__(name):
+    # keep `from etl.transform import schema` working without an eager import
+    if name == "schema":
+        return get_schema()
+    raise AttributeError(name)
 
 def validate_df(df: pd.DataFrame) -> pd.DataFrame:
     """Run custom and schema-based validation on DataFrame."""
+    import pandera as pa
     try:
         if not df["magnitude"].between(-1, 12).fillna(True).all():
             raise ValueError("Magnitude values are out of expected range (-1 to 12).")
@@ -66,7 +73,7 @@ def validate_df(df: pd.DataFrame) -> pd.DataFrame:
             raise ValueError("Latitude values are out of range (-90 to 90).")
         if not df["longitude"].between(-180, 180).fillna(True).all():
             raise ValueError("Longitude values are out of range (-180 to 180).")
-        return schema.validate(df, lazy=True)
+        return get_schema().validate(df, lazy=True)
     except pa.errors.SchemaErrors as e:
         logging.error("DataFrame validation failed with schema errors:\n%s", e.failure_cases)
         raise
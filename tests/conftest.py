@@ -0,0 +1,15 @@
+# tests/conftest.py
+
+import pytest
+from sqlalchemy import create_engine
+
+import etl.load as load
+from app.migrate import migrate
+
+@pytest.fixture
+def sqlite_engine(tmp_path, monkeypatch):
+    """A migrated SQLite database in tmp_path, also installed as the loader's engine."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'load.db'}", future=True)
+    migrate(engine)
+    monkeypatch.setattr(load, "engine", engine)
+    return engine
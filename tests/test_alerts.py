@@ -0,0 +1,109 @@
+# tests/test_alerts.py
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import etl.alerts as alerts
+from app.models import AlertSubscription, AlertDelivery
+from etl.alerts import GridIndex, Zone
+
+def _events(rows):
+    ts = pd.Timestamp("2024-01-01", tz="UTC")
+    return pd.DataFrame([{
+        "event_id": eid, "time_utc": ts, "updated_at": ts, "latitude": lat, "longitude": lon,
+        "magnitude": mag, "raw_place": "somewhere",
+    } for eid, lat, lon, mag in rows])
+
+def _matched(index, lat, lon, mag):
+    return {z.subscription_id: sorted(pos.tolist()) for z, pos in index.match(lat, lon, mag)}
+
+def test_radius_polygon_and_min_magnitude():
+    """Test that radius and polygon zones match by distance/containment and respect min magnitude."""
+    zones = [
+        Zone(1, min_magnitude=3.0, lat=34.0, lon=-118.0, radius_km=50),
+        Zone(2, polygon=json.dumps([[-125, 32], [-114, 32], [-114, 42], [-125, 42]])),
+    ]
+    index = GridIndex(zones, cell_deg=1.0)
+    lat = np.array([34.1, 34.1, 40.0, 10.0])
+    lon = np.array([-118.1, -118.1, -120.0, 10.0])
+    mag = np.array([4.0, 2.0, 1.0, 6.0])
+
+    assert _matched(index, lat, lon, mag) == {1: [0], 2: [0, 1, 2]}
+
+def test_radius_zone_across_antimeridian():
+    """Test that a radius zone centred near 180° matches events on both sides of the antimeridian."""
+    index = GridIndex([Zone(7, lat=-17.0, lon=179.8, radius_km=100)], cell_deg=1.0)
+    hits = _matched(index, np.array([-17.0, -17.0, -17.0]), np.array([-179.7, 179.5, 170.0]), np.ones(3))
+    assert hits == {7: [0, 1]}, f"Expected both sides of 180° to match, got {hits}"
+
+def test_grid_matches_brute_force():
+    """Test that grid-indexed matching agrees with testing every zone against every event."""
+    rng = np.random.default_rng(3)
+    zones = [Zone(i, min_magnitude=rng.uniform(0, 4), lat=rng.uniform(-80, 80), lon=rng.uniform(-180, 180),
+                  radius_km=rng.uniform(10, 800)) for i in range(300)]
+    lat, lon = rng.uniform(-85, 85, 2000), rng.uniform(-180, 180, 2000)
+    mag = rng.uniform(0, 6, 2000)
+
+    expected = {}
+    for z in zones:
+        pos = np.flatnonzero(z.contains(lat, lon) & (mag >= z.min_magnitude))
+        if len(pos):
+            expected[z.subscription_id] = pos.tolist()
+    assert _matched(GridIndex(zones, cell_deg=2.0), lat, lon, mag) == expected
+
+def test_zone_requires_geometry():
+    """Test that a subscription without polygon or centre+radius is rejected."""
+    with pytest.raises(ValueError):
+        Zone(1, lat=1.0, lon=2.0)
+
+def test_dispatch_alerts_once_per_subscription_and_event(sqlite_engine):
+    """Test that re-dispatching the same events does not notify a subscription twice."""
+    with Session(sqlite_engine) as s:
+        s.add(AlertSubscription(name="LA", min_magnitude=2.5, center_lat=34.0, center_lon=-118.0, radius_km=100))
+        s.add(AlertSubscription(name="off", center_lat=34.0, center_lon=-118.0, radius_km=100, active=0))
+        s.commit()
+
+    index = alerts.load_index(sqlite_engine)
+    assert len(index) == 1, "Inactive subscriptions should not be indexed"
+
+    df = _events([("A", 34.2, -118.2, 3.0), ("B", 34.2, -118.2, 1.0), ("C", 0.0, 0.0, 5.0)])
+    assert alerts.dispatch_alerts(df, index, bind=sqlite_engine) == 1
+    assert alerts.dispatch_alerts(df, index, bind=sqlite_engine) == 0
+
+    more = _events([("A", 34.2, -118.2, 3.0), ("D", 33.9, -117.9, 4.0)])
+    assert alerts.dispatch_alerts(more, index, bind=sqlite_engine) == 1
+    with Session(sqlite_engine) as s:
+        assert s.scalar(select(func.count()).select_from(AlertDelivery)) == 2
+
+def test_unconfigured_slack_subscription_is_not_marked_delivered(monkeypatch, sqlite_engine):
+    """Test that a slack subscription with no webhook anywhere records no delivery, so it can be retried."""
+    import etl.notify as notify
+
+    monkeypatch.setattr(notify, "SLACK_WEBHOOK", None)
+    with Session(sqlite_engine) as s:
+        s.add(AlertSubscription(name="LA", center_lat=34.0, center_lon=-118.0, radius_km=100, channel="slack"))
+        s.commit()
+
+    df = _events([("A", 34.2, -118.2, 3.0)])
+    assert alerts.dispatch_alerts(df, alerts.load_index(sqlite_engine), bind=sqlite_engine) == 0
+    with Session(sqlite_engine) as s:
+        assert s.scalar(select(func.count()).select_from(AlertDelivery)) == 0, "nothing was sent"
+    with pytest.raises(TypeError):
+        notify.Notifier()
+
+def test_invalid_subscriptions_are_skipped_not_fatal(sqlite_engine):
+    """Test that a malformed subscription is skipped and the valid ones still get alerts."""
+    with Session(sqlite_engine) as s:
+        s.add(AlertSubscription(name="LA", center_lat=34.0, center_lon=-118.0, radius_km=100))
+        s.add(AlertSubscription(name="no radius", center_lat=34.0, center_lon=-118.0))
+        s.add(AlertSubscription(name="bad polygon", polygon="[[1, 2], [3]"))
+        s.commit()
+
+    index = alerts.load_index(sqlite_engine)
+    assert [z.name for z in index.zones] == ["LA"], "only the valid subscription should be indexed"
+    assert alerts.dispatch_alerts(_events([("A", 34.2, -118.2, 3.0)]), index, bind=sqlite_engine) == 1
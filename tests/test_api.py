@@ -2,6 +2,7 @@
 
 from fastapi.testclient import TestClient
 from app.api import app
+from app.db import get_read_session
 
 client = TestClient(app)
 
@@ -23,3 +24,83 @@ def test_stats_by_country_route():
     if data:
         assert "country" in data[0], "Missing 'country' key in country stat"
         assert "events" in data[0], "Missing 'events' key in country stat"
+
+def test_singleflight_coalesces_concurrent_identical_calls():
+    """Test that a burst of identical requests runs the underlying query once."""
+    import threading
+    import time
+    from app.singleflight import SingleFlight
+
+    flight = SingleFlight()
+    executions = []
+    barrier = threading.Barrier(20)
+
+    def slow_query():
+        executions.append(1)
+        time.sleep(0.2)
+        return b"[]"
+
+    results = []
+    def worker():
+        barrier.wait()
+        results.append(flight.do(("events.json", 4.0, 10.0, 100), slow_query))
+
+    threads = [threading.Thread(target=worker) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [b"[]"] * 20
+    assert len(executions) == 1, "Expected one DB execution for the whole burst"
+    assert flight.stats()["coalescing_ratio"] == 0.95
+
+def _seeded_sessionmaker(eng, n):
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy.orm import sessionmaker
+    from app.models import FactEvent
+
+    t0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with sessionmaker(bind=eng)() as s:
+        # pairs of events share a timestamp so paging has to break ties on event_id
+        s.add_all(FactEvent(event_id=f"E{i:03d}", magnitude=3.0, time_utc=t0 + timedelta(seconds=i // 2))
+                  for i in range(n))
+        s.commit()
+    return sessionmaker(bind=eng)
+
+def test_events_html_streams_rows(sqlite_engine):
+    """Test that /events streams every requested row in chunks, newest first."""
+    from app.db import get_read_sessionmaker
+
+    app.dependency_overrides[get_read_sessionmaker] = lambda: _seeded_sessionmaker(sqlite_engine, 300)
+    try:
+        with client.stream("GET", "/events?limit=250&scroll=true") as response:
+            html = response.read().decode()
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert html.count("<tr>") == 251, "Expected header row + 250 event rows"
+    assert html.index("2024-01-01T00:02:29") < html.index("2024-01-01T00:00:25"), "Expected newest first"
+    assert "scrollStatus" in html, "Expected scroll paging script with scroll=true"
+    assert 'const chunkUrl = "/events/chunk?min_mag=0.0' in html, "Expected a relative chunk URL (no scheme/host)"
+
+def test_events_chunk_keyset_pages_cover_everything_once(sqlite_engine):
+    """Test that following `next` through /events/chunk returns each event exactly once."""
+    Session = _seeded_sessionmaker(sqlite_engine, 25)
+
+    def _session():
+        with Session() as s:
+            yield s
+
+    app.dependency_overrides[get_read_session] = _session
+    try:
+        seen, params = [], {"size": 4}
+        while True:
+            page = client.get("/events/chunk", params=params).json()
+            seen += [e["event_id"] for e in page["events"]]
+            if not page["next"]:
+                break
+            params = {"size": 4, **page["next"]}
+    finally:
+        app.dependency_overrides.clear()
+    assert seen == [f"E{i:03d}" for i in reversed(range(25))]
@@ -0,0 +1,88 @@
+# tests/test_archive.py
+
+import json
+import os
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import etl.load as load
+from app.models import DimPlace, FactEvent
+from etl.archive import archive_payload, iter_index, read_payload, object_path
+from etl.replay import replay_archive
+
+def _payload(versions):
+    """FeatureCollection bytes with one feature per (event_id, updated_ms, mag)."""
+    return json.dumps({"type": "FeatureCollection", "features": [{
+        "id": eid,
+        "properties": {"time": 1_700_000_000_000, "updated": updated, "mag": mag, "magType": "ml",
+                       "place": "10 km N of Anza, CA", "tsunami": 0, "type": "earthquake"},
+        "geometry": {"coordinates": [-116.7, 33.6, 10.0]},
+    } for eid, updated, mag in versions]}).encode()
+
+def _at(hour):
+    return datetime(2024, 1, 1, hour, tzinfo=timezone.utc)
+
+def test_identical_payloads_share_one_object(tmp_path):
+    """Test that archiving the same bytes twice stores one object but indexes both fetches."""
+    raw = _payload([("A", 1, 2.0)])
+    first = archive_payload(raw, "u", _at(1), root=str(tmp_path))
+    second = archive_payload(raw, "u", _at(2), root=str(tmp_path))
+
+    assert first == second
+    assert read_payload(first, root=str(tmp_path)) == raw
+    assert os.path.getsize(object_path(first, str(tmp_path))) < len(raw) + 64
+    assert [e["fetched_at"] for e in iter_index(root=str(tmp_path))] == [_at(1).isoformat(), _at(2).isoformat()]
+    assert len(list(iter_index(since=_at(2), root=str(tmp_path)))) == 1
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_replay_loads_newest_version_in_fetch_order(tmp_path, sqlite_engine, workers):
+    """Test that replay ends with the newest version of every event, whatever the worker count."""
+    root = str(tmp_path / "raw")
+    archive_payload(_payload([("A", 1, 2.0), ("B", 1, 3.0)]), "u", _at(1), root=root)
+    archive_payload(_payload([("A", 2, 2.5), ("B", 1, 3.0), ("C", 1, 4.0)]), "u", _at(2), root=root)
+    archive_payload(_payload([("C", 5, 4.4)]), "u", _at(3), root=root)
+
+    stats = replay_archive(workers=workers, batch_payloads=2, root=root)
+
+    assert stats["payloads"] == 3 and stats["features"] == 6
+    with Session(sqlite_engine) as s:
+        mags = dict(s.execute(select(FactEvent.event_id, FactEvent.magnitude)).all())
+    assert mags == {"A": 2.5, "B": 3.0, "C": 4.4}
+
+@pytest.mark.parametrize("mode", ["sqlite", "batch", "row"])
+def test_windowed_replay_never_rolls_back_newer_versions(tmp_path, monkeypatch, sqlite_engine, mode):
+    """Test that replaying an older window over newer data leaves the newer versions in place."""
+    monkeypatch.setattr(load, "LOAD_MODE", mode)
+    root = str(tmp_path / "raw")
+    archive_payload(_payload([("A", 1, 2.0), ("B", 1, 3.0)]), "u", _at(1), root=root)
+    archive_payload(_payload([("A", 9, 5.0)]), "u", _at(5), root=root)
+    replay_archive(workers=1, root=root)
+
+    replay_archive(until=_at(3), workers=1, root=root)
+
+    with Session(sqlite_engine) as s:
+        mags = dict(s.execute(select(FactEvent.event_id, FactEvent.magnitude)).all())
+    assert mags == {"A": 5.0, "B": 3.0}, f"older archived version overwrote a newer one: {mags}"
+
+@pytest.mark.parametrize("refresh", [True, False])
+def test_replay_refreshes_existing_places(tmp_path, sqlite_engine, refresh):
+    """Test that replay re-parses dim_place rows the loaders won't overwrite, unless told to keep them."""
+    with Session(sqlite_engine) as s:
+        s.add(DimPlace(raw_place="10 km N of Anza, CA", region="10 km N of Anza", country="CA"))
+        s.commit()
+    root = str(tmp_path / "raw")
+    archive_payload(_payload([("A", 1, 2.0)]), "u", _at(1), root=root)
+
+    stats = replay_archive(workers=1, root=root, refresh_places=refresh)
+
+    with Session(sqlite_engine) as s:
+        place = s.execute(select(DimPlace.region, DimPlace.country)).one()
+    if refresh:
+        assert stats["places_updated"] == 1
+        assert tuple(place) == ("California", "United States"), f"stale place kept: {place}"
+    else:
+        assert stats["places_updated"] == 0
+        assert tuple(place) == ("10 km N of Anza", "CA"), "--keep-places should leave dim_place alone"
@@ -0,0 +1,67 @@
+# tests/test_compression.py
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.compression import CompressionMiddleware, PrecompressedCache, negotiate, etag_for
+
+BODY = b'{"event_id":"us7000abcd","magnitude":4.2}' * 200
+
+def _client(cache=None):
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500, cache=cache or PrecompressedCache())
+
+    @app.get("/big")
+    def big():
+        return Response(BODY, media_type="application/json", headers={"ETag": etag_for(BODY)})
+
+    @app.get("/small")
+    def small():
+        return Response(b"[]", media_type="application/json")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter([b"<tr>row</tr>" * 50] * 10), media_type="text/html")
+
+    return TestClient(app)
+
+@pytest.mark.parametrize("header,expected", [
+    ("gzip, deflate, br, zstd", "zstd"),
+    ("gzip;q=1.0, br;q=0.9", "gzip"),
+    ("br, gzip", "br"),
+    ("*", "zstd"),
+    ("identity", None),
+    ("gzip;q=0", None),
+    ("", None),
+])
+def test_negotiate_respects_q_values_then_server_preference(header, expected):
+    """Test that Accept-Encoding q-values win and ties go to the server's preference order."""
+    assert negotiate(header, ["zstd", "br", "gzip"]) == expected
+
+@pytest.mark.parametrize("encoding", ["gzip", "br", "zstd"])
+def test_large_responses_are_compressed_and_cached(encoding):
+    """Test that a cacheable body is compressed once per encoding and served from the cache after."""
+    cache = PrecompressedCache()
+    client = _client(cache)
+    for _ in range(3):
+        r = client.get("/big", headers={"Accept-Encoding": encoding})
+        assert r.headers["content-encoding"] == encoding
+        assert "Accept-Encoding" in r.headers["vary"]
+        assert r.headers["etag"].endswith(f'-{encoding}"')
+        assert r.num_bytes_downloaded < len(BODY) / 10, "Expected the repetitive body to shrink on the wire"
+        assert r.content == BODY, "Expected the client to decode back to the original body"
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 2
+
+def test_small_responses_stay_uncompressed():
+    """Test that bodies under the minimum size are sent as-is."""
+    r = _client().get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert r.content == b"[]"
+
+def test_streamed_html_is_compressed_incrementally():
+    """Test that a streamed response is compressed chunk by chunk and decodes to the full page."""
+    r = _client().get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.text == "<tr>row</tr>" * 500
@@ -0,0 +1,102 @@
+# tests/test_db.py
+
+import importlib
+from datetime import datetime, timezone
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from app.api import app
+from app.db import make_engine, engine_stats
+from app.migrate import migrate
+from app.models import FactEvent
+
+def _seeded_engine(path, role, event_id):
+    eng = make_engine(f"sqlite:///{path}", role)
+    migrate(eng)
+    with sessionmaker(bind=eng)() as s:
+        s.add(FactEvent(event_id=event_id, magnitude=5.0, time_utc=datetime.now(timezone.utc)))
+        s.commit()
+    return eng
+
+@pytest.fixture
+def primary_and_replica(tmp_path, monkeypatch):
+    """app.db (and the loader bound to its engine) rebuilt from two SQLite URLs, restored afterwards."""
+    import app.db as db
+    import etl.load as load
+
+    primary, replica = tmp_path / "primary.db", tmp_path / "replica.db"
+    _seeded_engine(primary, "write", "from-primary").dispose()
+    _seeded_engine(replica, "write", "from-replica").dispose()
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{primary}")
+    monkeypatch.setenv("DATABASE_READ_URL", f"sqlite:///{replica}")
+    importlib.reload(db)
+    importlib.reload(load)
+    try:
+        yield db, load
+    finally:
+        db.engine.dispose()
+        db.read_engine.dispose()
+        monkeypatch.undo()
+        importlib.reload(db)
+        importlib.reload(load)
+
+def _event_ids(path) -> set:
+    eng = create_engine(f"sqlite:///{path}", future=True)
+    try:
+        with eng.connect() as conn:
+            return set(conn.execute(select(FactEvent.event_id)).scalars())
+    finally:
+        eng.dispose()
+
+def test_get_routes_read_from_replica(primary_and_replica, tmp_path):
+    """Test that DATABASE_READ_URL sends API GET routes to the replica while ETL writes go to the primary."""
+    db, load = primary_and_replica
+    assert db.read_engine is not db.engine, "Expected a separate read engine when DATABASE_READ_URL is set"
+
+    client = TestClient(app)
+    assert [e["event_id"] for e in client.get("/events.json").json()] == ["from-replica"]
+
+    ts = pd.Timestamp("2024-01-01", tz="UTC")
+    load.load_events(pd.DataFrame([{
+        "event_id": "from-etl", "time_utc": ts, "updated_at": ts, "latitude": 1.0, "longitude": 2.0,
+        "depth_km": 3.0, "magnitude": 4.0, "mag_type": "ML", "raw_place": "Somewhere, Chile",
+        "region": "Somewhere", "country": "Chile", "tsunami": 0, "source": "us",
+    }]))
+    assert _event_ids(tmp_path / "primary.db") == {"from-primary", "from-etl"}, "ETL should write to the primary"
+    assert _event_ids(tmp_path / "replica.db") == {"from-replica"}, "ETL must not write to the replica"
+    assert [e["event_id"] for e in client.get("/events.json").json()] == ["from-replica"]
+
+def test_pool_stats_track_checkouts(tmp_path):
+    """Test that make_engine records checkouts and pool wait times."""
+    eng = make_engine(f"sqlite:///{tmp_path / 'p.db'}", "write", pool_size=2, max_overflow=0)
+    for _ in range(3):
+        with eng.connect():
+            pass
+    snap = engine_stats(eng).snapshot(eng.pool)
+    assert snap["checkouts"] == 3 and snap["checkins"] == 3
+    assert snap["wait_max_ms"] >= 0.0
+
+def test_sqlite_profile_pragmas_and_query_only_reader(tmp_path):
+    """Test that file SQLite engines get WAL + tuned pragmas and the same-file reader cannot write."""
+    import pytest
+    from sqlalchemy.exc import OperationalError
+
+    url = f"sqlite:///{tmp_path / 'tuned.db'}"
+    writer = make_engine(url, "write")
+    reader = make_engine(url, "read", query_only=True)
+    migrate(writer)
+    with writer.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1, "Expected synchronous=NORMAL"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() > 0
+    assert writer.pool.size() == 1, "Expected a single-connection writer pool"
+
+    with sessionmaker(bind=reader)() as s:
+        assert s.query(FactEvent).count() == 0
+        s.add(FactEvent(event_id="nope"))
+        with pytest.raises(OperationalError):
+            s.commit()
@@ -0,0 +1,122 @@
+# tests/test_flow.py
+
+import json
+
+import pandas as pd
+import requests
+
+import etl.extract as extract
+import etl.flow as flow
+from etl.flow import _delta
+
+def test_delta_keeps_only_new_or_updated_events():
+    """Test that the daemon only reloads events it hasn't seen at that version."""
+    t0 = pd.Timestamp("2024-01-01", tz="UTC")
+    t1 = pd.Timestamp("2024-01-01 00:05", tz="UTC")
+    df = pd.DataFrame({
+        "event_id": ["A", "B", "C"],
+        "updated_at": [t0, t1, t0],
+    })
+    seen = {"A": t0, "B": t0}
+    delta = _delta(df, seen)
+    assert list(delta["event_id"]) == ["B", "C"], "Expected updated B and new C only"
+
+def _feature(event_id, updated_ms):
+    return {
+        "id": event_id,
+        "properties": {"time": 1_700_000_000_000, "updated": updated_ms, "mag": 2.5, "magType": "ml",
+                       "place": "10 km N of Anza, CA", "tsunami": 0, "type": "earthquake"},
+        "geometry": {"coordinates": [-116.7, 33.6, 10.0]},
+    }
+
+def _response(status, features=None, etag=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps({"type": "FeatureCollection", "features": features}).encode() if features else b""
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Last-Modified"] = "Mon, 01 Jan 2024 00:00:00 GMT"
+    return response
+
+class _FeedSession:
+    """Stands in for requests.Session: replays canned responses and records request headers."""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.sent_headers = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.sent_headers.append(dict(headers or {}))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+def _stub_pipeline(monkeypatch):
+    """Record loads instead of writing to a database; no archiving or alerts."""
+    loaded = []
+    monkeypatch.setattr(extract, "try_archive", lambda raw, url: None)
+    monkeypatch.setattr(flow, "load_events", lambda df, cache=None: loaded.append(list(df["event_id"])) or len(df))
+    monkeypatch.setattr(flow, "run_alerts", lambda df, index=None: 0)
+    return loaded
+
+def test_run_cycle_loads_delta_then_sends_validators_and_skips_304(monkeypatch):
+    """Test that a 200 loads new events and stores validators, and the following 304 loads nothing."""
+    loaded = _stub_pipeline(monkeypatch)
+    http = _FeedSession([_response(200, [_feature("A", 1), _feature("B", 1)], etag='"v1"'), _response(304)])
+    seen = {}
+
+    first = flow.run_cycle(http, flow.DimCache(), seen, None, "http://feed")
+    assert first["changed"] and first["loaded"] == 2, f"first cycle should load both events: {first}"
+    assert first["validators"] == {"etag": '"v1"', "last_modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert set(seen) == {"A", "B"}, "seen should hold the events of the last feed"
+
+    second = flow.run_cycle(http, flow.DimCache(), seen, first["validators"], "http://feed")
+    assert http.sent_headers[1] == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+    assert not second["changed"] and second["fetched"] == 0, "a 304 should not load anything"
+    assert second["validators"] == first["validators"], "validators should survive a 304"
+    assert set(seen) == {"A", "B"}, "a 304 should leave seen alone"
+    assert loaded == [["A", "B"]], f"unexpected loads: {loaded}"
+
+def test_run_daemon_backs_off_while_unchanged_and_resets_on_new_data(monkeypatch):
+    """Test that unchanged feeds and errors grow the delay up to the cap and new data resets it."""
+    loaded = _stub_pipeline(monkeypatch)
+    monkeypatch.setattr(flow, "notify", lambda msg: None)
+    monkeypatch.setattr(flow, "POLL_BACKOFF", 2.0)
+    http = _FeedSession([
+        _response(200, [_feature("A", 1)], etag='"v1"'),
+        _response(304),
+        requests.ConnectionError("feed down"),
+        _response(304),
+        _response(200, [_feature("A", 1), _feature("B", 1)], etag='"v2"'),
+        _response(304),
+    ])
+    monkeypatch.setattr(flow.requests, "Session", lambda: http)
+    delays = []
+    monkeypatch.setattr(flow.time, "sleep", delays.append)
+
+    flow.run_daemon(interval=10, max_interval=50, max_cycles=6, url="http://feed")
+
+    assert delays == [10, 20, 40, 50, 10], f"unexpected delays: {delays}"
+    assert loaded == [["A"], ["B"]], f"only new events should be loaded: {loaded}"
+    assert http.sent_headers[5].get("If-None-Match") == '"v2"', "the latest validators should be sent"
+
+def test_run_cycle_leaves_subscriptions_alone_when_alerts_are_off(monkeypatch):
+    """Test that with QW_ALERTS=0 a cycle never loads the subscription index, and index failures can't fail it."""
+    import etl.alerts as alerts
+
+    loaded = _stub_pipeline(monkeypatch)
+    monkeypatch.setattr(flow, "run_alerts", alerts.run_alerts)
+
+    def broken_index(*args, **kwargs):
+        raise RuntimeError("no such table: alert_subscription")
+
+    monkeypatch.setattr(alerts, "get_index", broken_index)
+    seen = {}
+    for enabled in (False, True):
+        monkeypatch.setattr(alerts, "ALERTS_ENABLED", enabled)
+        http = _FeedSession([_response(200, [_feature(f"A{enabled}", 1)], etag='"v1"')])
+        stats = flow.run_cycle(http, flow.DimCache(), seen, None, "http://feed")
+        assert stats["loaded"] == 1, f"cycle should succeed with alerts {'on' if enabled else 'off'}"
+    assert set(seen) == {"ATrue"}, "seen should be updated after the load"
+    assert len(loaded) == 2
@@ -0,0 +1,67 @@
+# tests/test_load.py
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+import etl.load as load
+from app.migrate import migrate
+from app.models import FactEvent, DimPlace, DimMagType
+
+def _frame(magnitudes):
+    ts = pd.Timestamp("2024-01-01", tz="UTC")
+    return pd.DataFrame([{
+        "event_id": f"E{i}", "time_utc": ts, "updated_at": ts,
+        "latitude": 1.0, "longitude": 2.0, "depth_km": None, "magnitude": m,
+        "mag_type": "ML", "raw_place": "5 km N of Town, Alaska", "region": "Alaska",
+        "country": "United States", "tsunami": 0, "source": "earthquake",
+    } for i, m in enumerate(magnitudes)])
+
+def test_copy_mode_falls_back_to_batched_upserts_on_sqlite(sqlite_engine):
+    """Test that COPY mode loads through the batched path on SQLite and upserts on re-load."""
+    assert load.load_events(_frame([1.0, 2.0]), mode="copy") == 2
+    assert load.load_events(_frame([3.0, 4.0, 5.0]), mode="copy") == 3
+
+    with Session(sqlite_engine) as s:
+        assert s.scalar(select(func.count()).select_from(FactEvent)) == 3
+        assert s.scalar(select(func.count()).select_from(DimPlace)) == 1
+        assert s.scalar(select(func.count()).select_from(DimMagType)) == 1
+        assert s.get(FactEvent, "E0").magnitude == 3.0, "Expected re-load to update existing rows"
+        assert s.get(FactEvent, "E0").depth_km is None
+
+def test_staging_csv_marks_nulls():
+    """Test that the COPY buffer writes missing values as \\N, not empty strings."""
+    buf = next(load._csv_chunks(_frame([1.0]), chunk_rows=10))
+    row = buf.getvalue().strip().split(",")
+    assert row[5] == "\\N"
+
+def test_changed_events_skips_unchanged_rows(sqlite_engine):
+    """Test that changed_events keeps only new rows and rows with a newer updated_at."""
+    load.load_events(_frame([1.0, 2.0]))
+    df = _frame([1.0, 2.0, 3.0])
+    df.loc[1, "updated_at"] = pd.Timestamp("2024-02-01", tz="UTC")
+
+    assert list(load.changed_events(df)["event_id"]) == ["E1", "E2"]
+
+def test_sqlite_loader_matches_batched_upserts(tmp_path, monkeypatch):
+    """Test that the SQLite executemany path stores exactly what the generic batched path stores."""
+    df = _frame([1.0, 2.0, None])
+    df.loc[1, "mag_type"] = None
+    df.loc[2, "raw_place"] = None
+    df = pd.concat([df, _frame([9.0])], ignore_index=True)   # repeated E0: last one wins
+
+    dumps = {}
+    for mode in ("batch", "sqlite"):
+        engine = create_engine(f"sqlite:///{tmp_path / f'{mode}.db'}", future=True)
+        migrate(engine)
+        monkeypatch.setattr(load, "engine", engine)
+        assert load.load_events(df, mode=mode) == 3
+        with Session(engine) as s:
+            dumps[mode] = [
+                (e.event_id, e.time_utc, e.updated_at, e.magnitude, e.depth_km, e.tsunami,
+                 e.mag_type.mag_type if e.mag_type else None, e.place.raw_place if e.place else None)
+                for e in s.scalars(select(FactEvent).order_by(FactEvent.event_id))
+            ]
+    assert dumps["sqlite"] == dumps["batch"]
+    assert dumps["sqlite"][0][3] == 9.0
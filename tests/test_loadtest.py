@@ -0,0 +1,96 @@
+# tests/test_loadtest.py
+
+import argparse
+import asyncio
+import math
+import random
+
+import httpx
+
+from benchmarks.loadtest import (
+    ALL, QueryMix, check_budgets, make_budgets, percentile, run_load, run_settings, settings_mismatch, summarize,
+)
+
+def test_percentile_is_nearest_rank():
+    """Test that percentiles pick an observed value by nearest rank."""
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50, "p50 of 1..100 should be 50"
+    assert percentile(values, 95) == 95, "p95 of 1..100 should be 95"
+    assert percentile(values, 99) == 99, "p99 of 1..100 should be 99"
+    assert percentile([7.5], 99) == 7.5, "a single sample is every percentile"
+    assert math.isnan(percentile([], 50)), "no samples should give NaN"
+
+def test_budgets_flag_only_regressions():
+    """Test that budgets derived from a run pass it, and a slower route fails them."""
+    baseline = summarize({"/health": [1.0] * 99 + [4.0], "/events.json": [10.0] * 100}, {}, 1.0)
+    budgets = make_budgets(baseline, headroom=1.5)
+    assert check_budgets(baseline, budgets) == [], "a run should fit its own budgets"
+
+    slower = summarize({"/health": [1.0] * 100, "/events.json": [10.0] * 90 + [50.0] * 10}, {"/events.json": 1}, 1.0)
+    failures = check_budgets(slower, budgets)
+    assert any(f.startswith("/events.json p95_ms") for f in failures), f"p95 regression not flagged: {failures}"
+    assert any(f.startswith(f"{ALL} error_rate") for f in failures), f"errors not flagged: {failures}"
+    assert not any(f.startswith("/health") for f in failures), f"unchanged route flagged: {failures}"
+    assert check_budgets({}, budgets) == [], "routes missing from the mix are not failures"
+
+    doubled = summarize({"/health": [2.0] * 99 + [8.0], "/events.json": [20.0] * 100}, {}, 1.0)
+    failures = check_budgets(doubled, make_budgets(baseline, headroom=1.25))
+    assert any(f.startswith("/events.json p50_ms") for f in failures), f"2x slowdown not flagged: {failures}"
+
+def test_budgets_only_gate_runs_with_the_same_settings(monkeypatch):
+    """Test that a different concurrency, request count or machine is reported as a settings mismatch."""
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///./loadtest.db")
+    args = argparse.Namespace(concurrency=8, requests=400, duration=None, events=1_000_000,
+                              mix="benchmarks/loadtest_mix.json", mix_from_log=None, base_url=None)
+    stored = run_settings(args)
+    assert stored["target"] == "sqlite" and stored["machine"]["cpus"] >= 1
+    assert settings_mismatch(stored, run_settings(args)) == [], "the same run should match its own settings"
+
+    args.concurrency = 1
+    assert [m.split(":")[0] for m in settings_mismatch(stored, run_settings(args))] == ["concurrency"]
+    other_host = dict(stored, machine=dict(stored["machine"], host="elsewhere"))
+    args.concurrency = 8
+    assert [m.split(":")[0] for m in settings_mismatch(other_host, run_settings(args))] == ["machine"]
+    assert settings_mismatch({}, stored), "budgets without recorded settings must not gate"
+
+def test_mix_from_access_log_keeps_route_and_parameter_frequencies():
+    """Test that an access log becomes weighted routes with observed parameter values."""
+    lines = [
+        'INFO:     127.0.0.1:50512 - "GET /events.json?min_mag=4&limit=100 HTTP/1.1" 200 OK',
+        'INFO:     127.0.0.1:50513 - "GET /events.json?min_mag=4 HTTP/1.1" 200 OK',
+        '10.0.0.1 - - [19/Oct/2026:10:00:00 +0000] "GET /events.json?min_mag=5&limit=100 HTTP/1.1" 200 512 "-" "curl"',
+        '10.0.0.1 - - [19/Oct/2026:10:00:01 +0000] "GET /health HTTP/1.1" 200 11 "-" "kube-probe"',
+        'INFO:     127.0.0.1:50514 - "GET /docs HTTP/1.1" 200 OK',
+        'INFO:     127.0.0.1:50515 - "POST /events.json HTTP/1.1" 405 Method Not Allowed',
+        "not a request line",
+    ]
+    mix = QueryMix.from_access_log(lines)
+    routes = {r["path"]: r for r in mix.routes}
+    assert set(routes) == {"/events.json", "/health"}, f"unexpected routes: {set(routes)}"
+    assert routes["/events.json"]["weight"] == 3, "route weight should be its hit count"
+    min_mag = routes["/events.json"]["params"]["min_mag"]
+    assert dict(zip(min_mag["values"], min_mag["weights"])) == {"4": 2, "5": 1}, f"bad min_mag: {min_mag}"
+    limit = routes["/events.json"]["params"]["limit"]
+    assert dict(zip(limit["values"], limit["weights"])) == {"100": 2, None: 1}, "omitted limit should be kept"
+
+    urls = {mix.sample(random.Random(3)) for _ in range(5)}
+    assert len(urls) == 1, "the same seed should replay the same requests"
+
+def test_run_load_reports_every_request():
+    """Test that the async driver issues the requested count and splits latencies and errors by route."""
+    async def app(scope, receive, send):
+        status = 500 if scope["path"] == "/boom" else 200
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    mix = QueryMix([{"path": "/ok", "weight": 3}, {"path": "/boom", "weight": 1}])
+
+    async def drive():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await run_load(client, mix, requests=200, concurrency=8)
+
+    report = asyncio.run(drive())
+    assert report[ALL]["requests"] == 200, f"expected 200 requests, got {report[ALL]['requests']}"
+    assert report["/ok"]["errors"] == 0, "2xx responses are not errors"
+    assert report["/boom"]["errors"] == report["/boom"]["requests"] > 0, "5xx responses should count as errors"
+    assert report["/ok"]["p99_ms"] >= report["/ok"]["p50_ms"] > 0, "latency percentiles should be ordered"
@@ -0,0 +1,13 @@
+# tests/test_migrate.py
+
+from sqlalchemy import create_engine, inspect
+from app.migrate import migrate, current_version, SCHEMA_VERSION
+
+def test_migrate_is_one_time_and_idempotent(tmp_path):
+    """Test that migrate creates the schema once and then only checks the version."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'm.db'}", future=True)
+    assert current_version(engine) == 0, "Expected a cold DB to report v0"
+
+    assert migrate(engine) == SCHEMA_VERSION
+    assert "fact_event" in inspect(engine).get_table_names()
+    assert migrate(engine) == SCHEMA_VERSION, "Second run should be a no-op"
@@ -0,0 +1,63 @@
+# tests/test_places.py
+
+import pandas as pd
+import pytest
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import DimPlace
+from etl.places import parse_place, normalize_places
+from etl.reprocess_places import reprocess_places
+
+@pytest.mark.parametrize("raw, expected", [
+    ("10 km NNE of Anza, CA", ("California", "United States")),
+    ("45 km S of Whites City, New Mexico", ("New Mexico", "United States")),
+    ("Andreanof Islands, Aleutian Islands, Alaska", ("Alaska", "United States")),
+    ("112 km W of Abepura, Indonesia", ("Abepura", "Indonesia")),
+    ("near the east coast of Honshu, Japan", ("Honshu", "Japan")),
+    ("5 km N of X, Russian Federation", ("X", "Russia")),
+    ("south of the Fiji Islands", ("Fiji Islands", "Fiji")),
+    ("Kermadec Islands region", ("Kermadec Islands", "New Zealand")),
+    ("Mid-Atlantic Ridge", ("Mid-Atlantic Ridge", None)),
+    ("15 km SW of Tbilisi, Georgia", ("Tbilisi", "Georgia")),
+    ("8 km E of Atlanta, GA", ("Georgia", "United States")),
+    ("South Sandwich Islands region", ("South Sandwich Islands", "South Georgia and the South Sandwich Islands")),
+    ("South Georgia Island region", ("South Georgia Island", "South Georgia and the South Sandwich Islands")),
+    ("Southwest Indian Ridge", ("Southwest Indian Ridge", None)),
+    ("Southeast Indian Ridge", ("Southeast Indian Ridge", None)),
+    ("North Atlantic Ocean", ("North Atlantic Ocean", None)),
+    ("West Chile Rise", ("West Chile Rise", None)),
+    ("Greece", ("Greece", "Greece")),
+    ("Mexico", ("Mexico", "Mexico")),
+    ("New Zealand", ("New Zealand", "New Zealand")),
+    ("central Peru", ("Peru", "Peru")),
+    ("near the coast of central Chile", ("Chile", "Chile")),
+    ("Georgia", ("Georgia", "Georgia")),
+    ("off the coast of Atlantis", ("off the coast of Atlantis", None)),
+    ("Atlantis region", ("Atlantis", None)),
+    (None, (None, None)),
+])
+def test_parse_place(raw, expected):
+    """Test that place strings normalize to a canonical (region, country)."""
+    assert parse_place(raw) == expected
+
+def test_normalize_places_batch_matches_scalar():
+    """Test that the Series path gives the same answers as parse_place, including missing values."""
+    places = pd.Series(["1 km E of A, CA", None, "1 km E of A, CA", "Fiji region"], index=[5, 6, 7, 8])
+    out = normalize_places(places)
+    assert list(out.index) == [5, 6, 7, 8]
+    assert list(out["country"]) == ["United States", None, "United States", "Fiji"]
+
+def test_reprocess_places_rewrites_country(sqlite_engine):
+    """Test that the reprocessing job rewrites stale dim_place rows in bulk."""
+    with Session(sqlite_engine) as s:
+        s.add_all([
+            DimPlace(raw_place="10 km NNE of Anza, CA", region="10 km NNE of Anza", country="CA"),
+            DimPlace(raw_place="Fiji region", region="Fiji", country="Fiji"),
+        ])
+        s.commit()
+
+    assert reprocess_places(sqlite_engine) == 1
+    with Session(sqlite_engine) as s:
+        countries = s.execute(select(DimPlace.country).order_by(DimPlace.place_id)).scalars().all()
+    assert countries == ["United States", "Fiji"]
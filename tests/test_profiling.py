@@ -0,0 +1,74 @@
+# tests/test_profiling.py
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.profiling import (
+    ServerTimingMiddleware, SlowQueryLog, collect, instrument, query_shape, slow_queries,
+)
+
+def test_query_shape_collapses_literals_and_in_lists():
+    """Test that statements differing only in parameters share one shape."""
+    a = query_shape("SELECT * FROM t WHERE id IN (?, ?, ?)  LIMIT 10")
+    b = query_shape("SELECT *\n FROM t WHERE id IN (?, ?) LIMIT 500")
+    assert a == b == "SELECT * FROM t WHERE id IN (?...) LIMIT ?"
+
+def test_slow_queries_are_timed_and_explained(tmp_path):
+    """Test that a slow statement lands in the slow log with a SQLite query plan."""
+    engine = instrument(create_engine(f"sqlite:///{tmp_path / 'p.db'}", future=True), threshold_ms=0)
+    slow_queries.clear()
+    with engine.connect() as conn, collect() as timings:
+        conn.execute(text("SELECT 1 WHERE 2 > 1"))
+    assert len(timings) == 1
+    top = slow_queries.top(1)
+    assert top[0]["shape"] == "SELECT ? WHERE ? > ?"
+    assert top[0]["plan"] is not None
+
+def test_slow_cte_queries_are_explained(tmp_path):
+    """Test that statements starting with WITH get a query plan too."""
+    engine = instrument(create_engine(f"sqlite:///{tmp_path / 'p.db'}", future=True), threshold_ms=0)
+    slow_queries.clear()
+    with engine.connect() as conn:
+        conn.execute(text("WITH x AS (SELECT 1 AS n) SELECT n FROM x"))
+    top = slow_queries.top(1)
+    assert top[0]["shape"].startswith("WITH"), top[0]["shape"]
+    assert top[0]["plan"] is not None, "CTE query should have been explained"
+
+def test_failed_statements_leave_no_state_on_the_connection(tmp_path):
+    """Test that a statement that raises doesn't leave timing state on the pooled connection."""
+    import pytest
+    from sqlalchemy.exc import OperationalError
+
+    engine = instrument(create_engine(f"sqlite:///{tmp_path / 'p.db'}", future=True), threshold_ms=1e9)
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing_table"))
+        conn.execute(text("SELECT 1"))
+        assert not any(key.startswith("qw_") for key in conn.info), f"leftover state: {dict(conn.info)}"
+
+def test_server_timing_header(tmp_path):
+    """Test that the middleware reports DB time for the statements a request ran."""
+    engine = instrument(create_engine(f"sqlite:///{tmp_path / 'p.db'}", future=True), threshold_ms=1e9)
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+
+    @app.get("/q")
+    def q():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return {}
+
+    header = TestClient(app).get("/q").headers["server-timing"]
+    assert header.startswith("db;dur=") and 'desc="2 queries"' in header
+
+def test_slow_query_log_orders_by_max():
+    """Test that top-N returns the slowest shapes first."""
+    log = SlowQueryLog()
+    log.record("a", 5.0)
+    log.record("b", 50.0)
+    log.record("a", 7.0)
+    assert [e["shape"] for e in log.top(2)] == ["b", "a"]
+    assert log.top(2, "count")[0]["shape"] == "a"
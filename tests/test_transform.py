@@ -43,3 +43,22 @@ def test_validate_rejects_bad_magnitude():
     }])
     with pytest.raises(ValueError, match="magnitude out of expected range"):
         validate_df(df)
+
+def test_parallel_transform_matches_serial():
+    """Test that sharded process-pool transform returns the same frame as the serial path."""
+    from etl.parallel import transform_parallel
+    from etl.transform import features_to_df
+
+    features = [
+        {
+            "id": f"E{i}",
+            "properties": {"time": 1_700_000_000_000 + i, "updated": 1_700_000_000_000 + i,
+                           "mag": 2.5, "magType": "ml" if i % 2 else None,
+                           "place": "5 km N of Town, Alaska" if i % 3 else None, "tsunami": 0},
+            "geometry": {"coordinates": [-150.0, 61.0, 10.0]},
+        }
+        for i in range(30)
+    ]
+    serial = validate_df(features_to_df(features))
+    parallel = transform_parallel(features, workers=2, shard_size=7)
+    pd.testing.assert_frame_equal(serial, parallel)